@@ -9,11 +9,10 @@
 #            Copyright 2015 Karl Dolenc, beholdingeye.com.             #
 #                         All rights reserved.                         #
 #                                                                      #
-#                  Python 2.6 or greater is required.                  #
+#                  Python 2.7 or greater is required.                  #
 #                                                                      #
-#         Tested with Python 2.7 and 3.4 on Debian GNU/Linux,          #
-#     and 2.6 on Mac OS X. MS Windows OS is supported, but has not     #
-#                             been tested.                             #
+#   Tested with Python 2.7 and 3.4 on Debian GNU/Linux. Mac OS X and   #
+#        MS Windows OS are supported, but have not been tested.        #
 #                                                                      #
 # -------------------------------------------------------------------- #
 #                                                                      #
@@ -55,9 +54,10 @@
 #  | bottomRow                                                      |  #
 #  |________________________________________________________________|  #
 #                                                                      #
-#  In the present implementation of the GUI, the top row and the       #
-#  bottom rows of the left and right columns are empty and minimized   #
-#  in size. This demonstrates the ease of adapting the template.       #
+#  In the present implementation of the GUI, the top row is empty      #
+#  and minimized in size, while the bottom rows of the left and right  #
+#  columns show the progress of a conversion and a button to cancel    #
+#  it. This demonstrates the ease of adapting the template.            #
 #                                                                      #
 #                             KNOWN ISSUES                             #
 #                                                                      #
@@ -79,13 +79,6 @@
 #  Lack of time prevented the development of the following features    #
 #  that would be nice to have.                                         #
 #                                                                      #
-#  * Interface control for the choice of comment symbol. The code      #
-#  already allows for the comment symbol being any one of '#$;:/*\',   #
-#  but '#' is presently fixed with a variable (commentChar). More      #
-#  refactoring work would be needed to implement a two-character       #
-#  solution.                                                           #
-#  * Interface control for line length in comment block. Presently     #
-#  fixed at 72 characters, the standard. A choice would be nice.       #
 #  * Interface control of text font size, presently fixed at 10px.     #
 #  * Option of a comment block without trailing spaces and comment     #
 #  symbols, featuring only leading ones.                               #
@@ -126,98 +119,2031 @@ except ImportError as e:
     # We're either in 2.5 or earlier - unsupported, or we're 
     # in 3+ and can continue regardless
     pass
-import sys, re
-import platform as pl
+import sys, os, re, io, time, tempfile, threading, zlib
+from itertools import islice, chain
+from array import array
+from bisect import bisect_right
 import textwrap as tw
+from collections import OrderedDict
+try:
+    _stringTypes = (str, unicode)
+    _textType = unicode
+except NameError: # Python 3
+    _stringTypes = (str,)
+    _textType = str
+_commentChars = "#$;:/*\\" # Recognised when reverting comment blocks
 gotTtk = True # Set to False if you prefer not to have ttk interface
 # inConsole will prevent "printing to terminal" when run from an IDE, like Geany
-inConsole = sys.stdin.isatty()
-if inConsole: print("Starting up Comment Block Maker...")
-if int(pl.python_version().split(".")[0]) >= 3: # Python version 3 or greater
-    import tkinter as tk
-    if gotTtk:
-        import tkinter.ttk as ttk # Needed for Sizegrip, Scrollbar and themes
-        if inConsole: print("Info: Module ttk available and loaded")
-    else:
-        if inConsole: print("Info: Module ttk not loaded, using Tkinter")
-        pass
-    import tkinter.font as tkfont
-    import tkinter.messagebox as msg
-    import tkinter.filedialog as fd
-    import tkinter.simpledialog as sDialog
-elif int(pl.python_version().split(".")[0]) == 2: # Python version 2.x
-    import Tkinter as tk
-    if gotTtk:
-        try:
-            import ttk # This will fail if ttk not installed, as can be the case in 2.6
+inConsole = False # Set when the GUI is launched, nothing is printed on import
+# Tkinter modules are only imported when the GUI is launched, by load_tk()
+tk = ttk = tkfont = msg = fd = sDialog = None
+
+def load_tk():
+    """Import the Tkinter modules needed by the GUI, if not already imported"""
+    global tk, ttk, tkfont, msg, fd, sDialog, gotTtk, inConsole
+    if tk is not None:
+        return
+    inConsole = sys.stdin.isatty()
+    if inConsole: print("Starting up Comment Block Maker...")
+    if sys.version_info[0] >= 3: # Python version 3 or greater
+        import tkinter as tk
+        if gotTtk:
+            import tkinter.ttk as ttk # Needed for Sizegrip, Scrollbar and themes
             if inConsole: print("Info: Module ttk available and loaded")
-        except ImportError as e:
+        else:
             if inConsole: print("Info: Module ttk not loaded, using Tkinter")
-            gotTtk = False
-    else:
-        if inConsole: print("Info: Module ttk not loaded, using Tkinter")
-        pass
-    import tkFont as tkfont
-    import tkMessageBox as msg
-    import tkFileDialog as fd
-    import tkSimpleDialog as sDialog
-else: # Can't handle versions under 2
-    # Exit silently because print keyword would raise SyntaxError in Py 3
-    sys.exit()
+            pass
+        import tkinter.font as tkfont
+        import tkinter.messagebox as msg
+        import tkinter.filedialog as fd
+        import tkinter.simpledialog as sDialog
+    elif sys.version_info[0] == 2: # Python version 2.x
+        import Tkinter as tk
+        if gotTtk:
+            try:
+                import ttk # This will fail if ttk not installed, as can be the case in 2.6
+                if inConsole: print("Info: Module ttk available and loaded")
+            except ImportError as e:
+                if inConsole: print("Info: Module ttk not loaded, using Tkinter")
+                gotTtk = False
+        else:
+            if inConsole: print("Info: Module ttk not loaded, using Tkinter")
+            pass
+        import tkFont as tkfont
+        import tkMessageBox as msg
+        import tkFileDialog as fd
+        import tkSimpleDialog as sDialog
+    else: # Can't handle versions under 2
+        # Exit silently because print keyword would raise SyntaxError in Py 3
+        sys.exit()
+
+
+# --------------------- COMMENT STYLES ---------------------
+
+# Prefix, suffix and border character of each style, and its name in menus
+commentStyles = OrderedDict([
+    ("#", ("#", "#", "#", "Hash  #")),
+    ("$", ("$", "$", "$", "Dollar  $")),
+    (";", (";", ";", ";", "Semicolon  ;")),
+    (":", (":", ":", ":", "Colon  :")),
+    ("/", ("/", "/", "/", "Slash  /")),
+    ("*", ("*", "*", "*", "Asterisk  *")),
+    ("\\", ("\\", "\\", "\\", "Backslash  \\")),
+    ("//", ("//", "//", "/", "C++  //")),
+    ("--", ("--", "--", "-", "SQL, Lua, Haskell  --")),
+    (";;", (";;", ";;", ";", "Lisp  ;;")),
+    ("/*", ("/*", "*/", "*", "C  /* */")),
+])
+# Other names of styles, such as for a command line that takes "--" as the end of options
+styleAliases = {"cpp": "//", "sql": "--", "lisp": ";;", "c": "/*"}
+
+class CommentStyle(object):
+    """The delimiters and width of a kind of comment block, with the strings made from them
+    
+    Each block line is prefix + text + suffix, width characters long, and
+    borders are filled with the border character between them. Everything
+    that does not depend on the text is made once, here. Blocks of single
+    character styles are reverted by any of the characters of _commentChars,
+    as blocks of one are of the others.
+    """
+    
+    def __init__(self, name, prefix, suffix, border, width=72):
+        """Make the strings of a style"""
+        innerWidth = width - len(prefix) - len(suffix)
+        if innerWidth < 6:
+            raise ValueError("Comment block is too narrow for its delimiters")
+        self.name = name
+        self.prefix = prefix
+        self.suffix = suffix
+        self.borderChar = border
+        self.width = width
+        self.innerWidth = innerWidth # Between prefix and suffix
+        self.textWidth = innerWidth - 4 # Wrapping width, less 2 spaces each side
+        self.border = prefix + border*innerWidth + suffix
+        self.blankLine = prefix + " "*innerWidth + suffix
+        self.indent = prefix + "  " # Start of left aligned lines
+        self.markerStart = prefix + "  cbm:" # Of block lines of an exact revert marker
+        # Recognised when reverting, as sets to look up slices of the same length in
+        if len(prefix) == 1 and len(suffix) == 1:
+            self.prefixes = self.suffixes = frozenset(_commentChars)
+            self.borderChars = _commentChars
+        else:
+            self.prefixes, self.suffixes = frozenset([prefix]), frozenset([suffix])
+            self.borderChars = "".join(sorted(set(prefix + suffix + border)))
+        # And as tuples for str.startswith() and str.endswith()
+        self.markerStarts = tuple([x + "  cbm:" for x in sorted(self.prefixes)])
+        self.markerEnds = tuple([" " + x for x in sorted(self.suffixes)])
+    
+    def __repr__(self):
+        return "CommentStyle(%r, width=%d)" % (self.name, self.width)
+    
+    def __reduce__(self):
+        """Pickle the style by its parts, to be made again in worker processes"""
+        return (_unpickle_style, (self.name, self.prefix, self.suffix, self.borderChar, self.width))
+
+_styles = {} # CommentStyle of each name and width, made when first asked for
+
+def get_style(name="#", width=72):
+    """Return the CommentStyle of a name in commentStyles or styleAliases, and width"""
+    name = styleAliases.get(name, name)
+    style = _styles.get((name, width))
+    if style is None:
+        if name not in commentStyles:
+            raise ValueError("Unknown comment style " + name)
+        prefix, suffix, border, label = commentStyles[name]
+        style = _styles[(name, width)] = CommentStyle(name, prefix, suffix, border, width)
+    return style
+
+def _unpickle_style(name, prefix, suffix, border, width):
+    """Return the style of a pickle, the one get_style() gives if it is the same, as the
+    caches tell styles apart by identity
+    """
+    if commentStyles.get(name, ())[:3] == (prefix, suffix, border):
+        return get_style(name, width)
+    return CommentStyle(name, prefix, suffix, border, width)
 
 
 # --------------------- FUNCTIONS ---------------------
 
-def revert_to_plain(commentBlock, commentChar):
-    """Revert comment block to plain text"""
-    # Revert empty lines as own paragraphs
-    plainText = re.sub(r"(?m)^[#$;:/*\\][ ]+[#$;:/*\\]$\n",r"\n",commentBlock,count=0)
-    # Delete lines with comment characters only (must be done here)
-    plainText = re.sub(r"(?m)^[#$;:/*\\]+$\n?","",plainText,count=0)
-    # Revert centred lines as own paragraphs
-    plainText = re.sub(r"(?m)^[#$;:/*\\][ ]{4,}([^ ].+?)[ ]+[#$;:/*\\]$\n",
-                        r"\1\n",plainText,count=0)
-    # Revert lines with at least c. 1/3 as many trailing spaces as text, to own paragraphs
-    testNum = int((len(commentBlock.splitlines()[0])-4)/3) # Minus 4 to account for "^#  " and "#$"
-    plainText = re.sub(r"(?m)^[#$;:/*\\][ ]+([^ ].+?)[ ]{"+str(testNum)+r",}[#$;:/*\\]$\n",
-                        r"\1\n",plainText,count=0)
-    # Join adjacent lines of text that remain
-    plainText = re.sub(r"([^ \n]+)[ ]+[#$;:/*\\]\n[#$;:/*\\]?[ ]*([^ \n]+)",r"\1 \2",plainText,count=0)
-    # Remove the remaining commenting
-    #plainText = plainText.strip(" "+commentChar) # regex is safer
-    plainText = re.sub(r"(?m)^[#$;:/*\\][ ]+","",plainText,count=0)
-    plainText = re.sub(r"(?m)[ ]+[#$;:/*\\]$","",plainText,count=0)
-    if plainText[-1] == "\n": # Remove last line break
-        plainText == plainText[:-1]
-    return plainText
+def revert_to_plain(commentBlock, style):
+    """Revert comment block of a CommentStyle to plain text"""
+    return _revert_lines(commentBlock.split("\n"), style)
 
-def convert_to_comment(plainText, alignCenter, centerTitles, padCount, commentChar, numChars):
-    """Convert plain text to comment block"""
-    blockText = ""
-    plainText = plainText.replace("\t", "    ") # Convert tabs to 4 spaces
-    if plainText[-1] != "\n":
-        plainText == plainText + "\n"
-    if padCount:
-        plainText = "\n"*padCount + plainText + "\n"*padCount
-    # Wrapper only works on single paragraphs
-    for line in plainText.splitlines():
-        if line == "":
-            blockText = blockText + commentChar + " "*(numChars-2) + commentChar + "\n"
+def _revert_lines(blockLines, style, feed=iter):
+    """Return the plain text reverted from a list of block lines, exactly if marked
+    
+    The lines are read through feed(blockLines), such as to report progress.
+    """
+    found = _find_marker(blockLines, style)
+    if found is not None: # Marked when converted, for an exact revert
+        try:
+            marker = found[0]
+            plainText = "\n".join(_iter_exact_lines(feed(blockLines), marker, style))
+            return plainText + "\n" if marker["endsWithBreak"] else plainText
+        except _MarkerMismatch: # Edited since, so reverted as if not marked
+            blockLines = blockLines[:found[1]] + blockLines[found[2]:]
+    return "\n".join(iter_plain_lines(feed(blockLines), style))
+
+def iter_plain_lines(blockLines, style):
+    """Generate the lines of plain text reverted from the lines of a comment block
+    
+    blockLines is an iterable of block lines without line breaks, and the
+    result joined with line breaks is the reverted text. Each block line is
+    classified once, as a border, a blank line, a centred or short line that
+    makes its own paragraph, or text to be joined with the next line. One
+    line of lookahead is kept, so this can work through a stream.
+    """
+    # Delimiters are matched as tuples of those the style accepts, all of one length
+    prefixes, suffixes = style.prefixes, style.suffixes
+    prefixLen, suffixLen = len(style.prefix), len(style.suffix)
+    lines = _iter_classified_lines(iter(blockLines), style)
+    try:
+        line = next(lines)
+    except StopIteration:
+        return
+    parts = [] # Pieces of the plain line being built by joining block lines
+    scanStart = 0 # Text before this index was already used joining to the previous line
+    for nextLine in lines:
+        wordStart = wordEnd = -1
+        # Text ending in a word, spaces and a comment suffix is joined to the next line...
+        end = len(line) - suffixLen
+        if end > 0 and line[end:] in suffixes and line[end-1] == " ":
+            textEnd = len(line[:end].rstrip(" "))
+            if textEnd > scanStart:
+                # ...if that line starts with a word, after an optional comment prefix
+                wordStart = 0
+                if nextLine[:prefixLen] in prefixes:
+                    wordStart = len(nextLine) - len(nextLine[prefixLen:].lstrip(" "))
+                    if wordStart == len(nextLine): # No word after the comment character
+                        wordStart = 0
+                else:
+                    wordStart = len(nextLine) - len(nextLine.lstrip(" "))
+                wordEnd = nextLine.find(" ", wordStart)
+                if wordEnd == -1: wordEnd = len(nextLine)
+        if wordEnd > wordStart:
+            parts.append(line[:textEnd])
+            parts.append(" ")
+            line, scanStart = nextLine[wordStart:], wordEnd - wordStart
         else:
-            # Center lines that start with 5+ hyphens, and are less than numChars-5 long in total
-            a = ""
-            if len(line) <= numChars-6 and line.startswith("-----") and centerTitles:
-                line = re.sub(r"^\-+", "", line, count=1)
-                a = commentChar + line.center(numChars-2) + commentChar + "\n"
-                blockText = blockText + a
+            parts.append(line)
+            yield _strip_commenting("".join(parts), style)
+            parts = []
+            line, scanStart = nextLine, 0
+    parts.append(line)
+    yield _strip_commenting("".join(parts), style)
+
+def _iter_classified_lines(blockLines, style):
+    """Generate block lines with borders removed and own paragraphs made plain
+    
+    The last line is taken to have no line break after it, the others do.
+    """
+    try:
+        line = next(blockLines)
+    except StopIteration:
+        return
+    prefixes, suffixes, borderChars = style.prefixes, style.suffixes, style.borderChars
+    prefixLen, suffixLen = len(style.prefix), len(style.suffix)
+    # Lines with at least c. 1/3 as many trailing spaces as text make own paragraphs
+    firstLine = line.splitlines()[0] if line.splitlines() else ""
+    # Less the delimiters and 2 spaces, as in "#  " and "#" at the ends
+    testNum = int((len(firstLine) - prefixLen - suffixLen - 2)/3.0)
+    for nextLine in blockLines:
+        if line.strip(borderChars) == "": # Only border characters...
+            if line != "": # ...are a border, deleted, unless empty
+                line = nextLine
+                continue
+        elif (len(line) >= prefixLen + suffixLen and line[:prefixLen] in prefixes and 
+                line[len(line)-suffixLen:] in suffixes):
+            inner = line[prefixLen:len(line)-suffixLen]
+            text = inner.lstrip(" ")
+            if text == "": # Empty line as own paragraph
+                line = ""
             else:
-                for x in tw.wrap(line,width=numChars-6,replace_whitespace=False): # List of lines
-                    if alignCenter:
-                        a = a + commentChar + x.center(numChars-2) + commentChar + "\n"
-                    else: # Align left
-                        a = a + commentChar + "  " + x.ljust(numChars-4) + commentChar + "\n"
-                blockText = blockText + a
-    return commentChar*numChars + "\n" + blockText + commentChar*numChars
+                leadCount = len(inner) - len(text)
+                trailCount = len(text) - len(text.rstrip(" "))
+                text = text.rstrip(" ")
+                if len(text) == 1: # A single character takes a space with it
+                    text, trailCount = text + " ", trailCount - 1
+                if leadCount >= 4 and trailCount >= 1: # Centred line as own paragraph
+                    line = text
+                elif leadCount >= 1 and testNum >= 0 and trailCount >= testNum:
+                    line = text
+        yield line
+        line = nextLine
+    # Without a line break after it, the last line is only removed if it is a border
+    if line != "" and line.strip(borderChars) == "":
+        line = ""
+    yield line
+
+def _strip_commenting(line, style):
+    """Remove comment delimiters and adjacent spaces from ends of a reverted line"""
+    prefixLen, suffixLen = len(style.prefix), len(style.suffix)
+    if line[prefixLen:prefixLen+1] == " " and line[:prefixLen] in style.prefixes:
+        line = line[prefixLen:].lstrip(" ")
+    if line[-suffixLen-1:-suffixLen] == " " and line[-suffixLen:] in style.suffixes:
+        line = line[:-suffixLen].rstrip(" ")
+    return line
+
+def iter_comment_lines(plainText, alignCenter, centerTitles, padCount, style, exact=False, 
+                        optimalFit=False):
+    """Generate the lines of a comment block one at a time, without line breaks
+    
+    plainText may be a string, or an iterable of strings that each end on a
+    line boundary, such as an open file. Only one line of input is worked on
+    at a time, so the cost is linear in the size of the text. If exact, the
+    block ends with marker lines from which revert_to_plain() restores the
+    text exactly, but for line breaks, which are restored as "\\n". If
+    optimalFit, paragraphs are wrapped for the least ragged right edge,
+    rather than filling each block line in turn.
+    """
+    if exact and style.innerWidth < 8:
+        raise ValueError("A marked comment block must be at least 8 characters wider "
+                            "than its delimiters")
+    border = style.border
+    blankLine = style.blankLine
+    yield border
+    for x in range(padCount):
+        yield blankLine
+    if exact:
+        ends = [] # Last characters of the text, to tell if it ends with a line break
+        marker = _Marker(alignCenter, padCount)
+        for line in _iter_text_lines(plainText, ends):
+            paragraph = make_paragraph(line, alignCenter, centerTitles, style, True, optimalFit)
+            marker.add(line, paragraph)
+            for x in paragraph.render(style):
+                yield x
+        marker.endsWithBreak = ends[-1:] != [] and ends[-1].splitlines() == [""]
+    else:
+        for line in _iter_text_lines(plainText):
+            if line == "":
+                yield blankLine
+            else:
+                for x in _paragraph_lines(line, alignCenter, centerTitles, style, optimalFit):
+                    yield x
+    for x in range(padCount):
+        yield blankLine
+    if exact:
+        for x in marker.rows(style):
+            yield x
+    yield border
+
+def convert_to_comment(plainText, alignCenter, centerTitles, padCount, style, exact=False, 
+                        jobs=1, optimalFit=False):
+    """Convert plain text to comment block of a CommentStyle, marked for an exact revert if exact
+    
+    A text of more than _parallelThreshold characters is converted in chunks
+    by jobs worker processes, one per CPU if 0, unless exact. Paragraphs are
+    wrapped for the least ragged right edge if optimalFit.
+    """
+    if isinstance(plainText, _stringTypes) and not exact and len(plainText) > _parallelThreshold:
+        numJobs = jobs or _cpu_count()
+        if numJobs > 1:
+            return "\n".join(_iter_parallel_block(plainText.splitlines(), alignCenter, 
+                                                    centerTitles, padCount, style, numJobs, 
+                                                    optimalFit))
+    return "\n".join(iter_comment_lines(plainText, alignCenter, centerTitles, padCount, style, 
+                                        exact, optimalFit))
+
+def _paragraph_lines(line, alignCenter, centerTitles, style, optimalFit=False):
+    """Return the block lines of one line of plain text as a tuple"""
+    if line == "":
+        return (style.blankLine,)
+    # Whether titles are centred only matters for lines that may be titles
+    key = (line, style, alignCenter, centerTitles and line.startswith("-----"), bool(optimalFit))
+    rows = _paragraphCache.get(key)
+    if rows is None: # Laid out without a Paragraph, as this is the common case
+        expanded, spans, wide = _layout(line, centerTitles, style.textWidth, optimalFit)
+        if spans is None:
+            rows = _render_rows(True, (expanded.lstrip("-"),), style, wide)
+        else:
+            rows = _render_rows(alignCenter, [expanded[i:j] for i, j in spans], style, wide)
+        _paragraphCache.put(key, rows)
+    return rows
+
+def _layout(line, centerTitles, textWidth, optimalFit=False):
+    """Return line with tabs expanded, the spans of its pieces, or None if it is a title, and
+    whether it has characters that are not one column wide, wrapped by optimal fit if
+    optimalFit, else greedily as textwrap does"""
+    if "\t" in line: # Convert tabs to 4 spaces
+        line = line.replace("\t", "    ")
+    if _otherCharsRe.search(line) is None: # Printable ASCII, a column each
+        # Center lines that start with 5+ hyphens, and fit in textWidth in total
+        if len(line) <= textWidth and line.startswith("-----") and centerTitles:
+            return line, None, False
+        if optimalFit:
+            return line, _fit_spans(line, textWidth), False
+        # Wrapper only works on single paragraphs
+        return line, _wrap_spans(line, textWidth), False
+    wide = _has_odd_widths(line)
+    if (text_width(line) if wide else len(line)) <= textWidth and line.startswith("-----") and \
+            centerTitles:
+        return line, None, wide
+    if optimalFit:
+        return line, _fit_spans(line, textWidth, wide), wide
+    return line, _wrap_spans_textwrap(line, textWidth, wide), wide
+
+def _render_rows(alignCenter, pieces, style, wide=False):
+    """Return the block lines of pieces of text as a tuple, padded by columns if wide"""
+    prefix, suffix = style.prefix, style.suffix
+    if wide:
+        return _render_wide_rows(alignCenter, pieces, style)
+    if alignCenter:
+        width = style.innerWidth
+        return tuple([prefix + x.center(width) + suffix for x in pieces])
+    indent, width = style.indent, style.innerWidth - 2
+    return tuple([indent + x.ljust(width) + suffix for x in pieces])
+
+class Paragraph(object):
+    """One line of plain text as laid out in a comment block
+    
+    kind is "blank", "title" or "text", align is "left" or "center", and
+    lines are the pieces of text put on block lines, without padding. spacing
+    holds what the layout leaves out: for text, the number of spaces before,
+    between and after the pieces; for a title, the number of its hyphens.
+    tabs are the positions of tabs in the line, which are expanded to spaces.
+    Without spacing, single spaces and 5 hyphens are taken to be left out.
+    """
+    __slots__ = ("kind", "align", "lines", "spacing", "tabs", "wide")
+    
+    def __init__(self, kind, align, lines, spacing=(), tabs=(), wide=False):
+        """Create the paragraph from its parts, wide if any are not one column a character"""
+        self.kind = kind
+        self.align = align
+        self.lines = lines
+        self.spacing = spacing
+        self.tabs = tabs
+        self.wide = wide
+    
+    def render(self, style):
+        """Return the block lines of the paragraph in a CommentStyle as a tuple"""
+        if self.kind == "blank":
+            return (style.blankLine,)
+        return _render_rows(self.align == "center", self.lines, style, self.wide)
+    
+    def plain(self):
+        """Return the line of plain text of the paragraph"""
+        if self.kind == "blank":
+            return ""
+        if not self.spacing:
+            line = "-----" + self.lines[0] if self.kind == "title" else " ".join(self.lines)
+        elif self.kind == "title":
+            line = "-"*self.spacing[0] + self.lines[0]
+        else: # Spaces and pieces of text in turn
+            parts = [" "*self.spacing[0]]
+            for i, piece in enumerate(self.lines):
+                parts.append(piece)
+                parts.append(" "*self.spacing[i+1])
+            line = "".join(parts)
+        if self.tabs:
+            parts = []
+            start = 0
+            for i in self.tabs:
+                parts.append(line[start:i])
+                start = i + 4
+            parts.append(line[start:])
+            line = "\t".join(parts)
+        return line
+
+def make_paragraph(line, alignCenter, centerTitles, style, exact=False, optimalFit=False):
+    """Return the Paragraph of one line of plain text in a comment block of a CommentStyle
+    
+    Spacing and tabs are only found if exact, for plain() to give back line.
+    """
+    align = "center" if alignCenter else "left"
+    if line == "":
+        return Paragraph("blank", align, ())
+    tabs = ()
+    if exact and "\t" in line: # Positions of tabs once expanded to 4 spaces
+        tabs = []
+        for part in line.split("\t")[:-1]:
+            tabs.append(tabs[-1] + 4 + len(part) if tabs else len(part))
+        tabs = tuple(tabs)
+    line, spans, wide = _layout(line, centerTitles, style.textWidth, optimalFit)
+    if spans is None:
+        title = line.lstrip("-")
+        return Paragraph("title", "center", (title,), 
+                        (len(line) - len(title),) if exact else (), tabs, wide)
+    spacing = ()
+    if exact:
+        spacing = []
+        end = 0
+        for i, j in spans:
+            spacing.append(i - end)
+            end = j
+        spacing.append(len(line) - end)
+        spacing = tuple(spacing)
+    return Paragraph("text", align, tuple([line[i:j] for i, j in spans]), spacing, tabs, wide)
+
+class _Marker(object):
+    """Record of the paragraphs of a comment block being made, for reverting it exactly
+    
+    Each paragraph is recorded as a letter and a number, such as p3 for text
+    on 3 block lines, t5 for a title after 5 hyphens or b2 for 2 blank lines.
+    The spacing and tabs that differ from the usual follow in the same way,
+    with the number of a block line first where needed, as in g2.3 for 3
+    spaces left out before the third block line of a paragraph.
+    The record is put on block lines starting with "cbm:", after the padding.
+    """
+    
+    def __init__(self, alignCenter, padCount):
+        """Start the record of a block with the given options"""
+        self.alignCenter = alignCenter
+        self.padCount = padCount
+        self.endsWithBreak = False
+        self.checksum = 0
+        self.blankCount = 0
+        self.records = []
+    
+    def add(self, line, paragraph):
+        """Record the paragraph made from a line of plain text"""
+        self.checksum = zlib.crc32(_utf8(line + "\n"), self.checksum)
+        if paragraph.kind == "blank": # Runs of blank lines make one record
+            self.blankCount += 1
+            return
+        self._add_blanks()
+        lines, spacing = paragraph.lines, paragraph.spacing
+        if paragraph.kind == "title":
+            record = ["t%d" % spacing[0]]
+        else:
+            record = ["p%d" % len(lines)]
+            if spacing[0]:
+                record.append("h%d" % spacing[0])
+            for i in range(1, len(lines)):
+                if spacing[i] != 1:
+                    record.append("g%d.%d" % (i, spacing[i]))
+            if lines and spacing[-1]:
+                record.append("e%d" % spacing[-1])
+        # Block lines are padded, so spaces at either end of their text are needed too
+        for i, line in enumerate(lines):
+            lead = len(line) - len(line.lstrip(" "))
+            if lead:
+                record.append("l%d.%d" % (i, lead))
+            if lead < len(line) and line[-1] == " ":
+                record.append("r%d.%d" % (i, len(line) - len(line.rstrip(" "))))
+        for i in paragraph.tabs:
+            record.append("x%d" % i)
+        self.records.append("".join(record))
+    
+    def _add_blanks(self):
+        """Record the blank lines since the last paragraph"""
+        if self.blankCount:
+            self.records.append("b%d" % self.blankCount if self.blankCount > 1 else "b")
+            self.blankCount = 0
+    
+    def rows(self, style):
+        """Return the block lines of the marker, after all paragraphs are added"""
+        self._add_blanks()
+        payload = "v1c%d%sd%da%d%s" % (self.checksum & 0xffffffff, "n" if self.endsWithBreak else "", 
+                                        self.padCount, int(bool(self.alignCenter)), 
+                                        "".join(self.records))
+        width = style.innerWidth - 7
+        return [style.markerStart + payload[i:i+width].ljust(width) + " " + style.suffix 
+                for i in range(0, len(payload), width)]
+
+class _MarkerMismatch(Exception):
+    """A comment block does not match its marker, so it was edited after it was marked"""
+
+def _find_marker(blockLines, style):
+    """Return the parsed marker ending a list of block lines, with the index of its first and
+    last line plus one, or None if the block is not marked
+    
+    Only the end of the list is looked at, so the list may hold the end alone.
+    Lines of text may start with "cbm:" too, so the marker is only taken to
+    start at a line with its version, and to be there if it parses.
+    """
+    end = len(blockLines)
+    while end and blockLines[end-1] == "":
+        end -= 1
+    if end == 0:
+        return None
+    border = blockLines[end-1]
+    if border.strip(style.borderChars) != "":
+        return None
+    start = end - 1
+    while (start and blockLines[start-1].startswith(style.markerStarts) and 
+            blockLines[start-1].endswith(style.markerEnds) and 
+            len(blockLines[start-1]) == len(border)):
+        start -= 1
+    found = _parse_marker_rows(blockLines[start:end-1], style)
+    if found is None:
+        return None
+    return found[0], start + found[1], end - 1
+
+def _parse_marker_rows(rows, style):
+    """Return the parsed marker made of the last of a list of block lines starting with "cbm:",
+    with the index of its first line, or None if they do not end with one"""
+    payloadStart, payloadEnd = len(style.markerStart), -len(style.suffix)
+    payloads = [x[payloadStart:payloadEnd].rstrip(" ") for x in rows]
+    for i in range(len(payloads) - 1, -1, -1): # Only the version, v1, starts with a v
+        if payloads[i].startswith("v"):
+            try:
+                return _parse_marker("".join(payloads[i:])), i
+            except _MarkerMismatch: # Text, or a marker edited since
+                pass
+    return None
+
+def _iter_unmarked_rows(blockLines, style):
+    """Generate the lines of comment blocks without the marker lines before their borders, 
+    keeping lines of text that start with "cbm:" as well as markers that do not parse"""
+    rows = [] # Lines that may be of a marker, held until the line after them
+    for line in blockLines:
+        if line.startswith(style.markerStarts) and line.endswith(style.markerEnds):
+            rows.append(line)
+            continue
+        if rows:
+            if line != "" and line.strip(style.borderChars) == "":
+                found = _parse_marker_rows(rows, style)
+                if found is not None:
+                    del rows[found[1]:]
+            for x in rows:
+                yield x
+            rows = []
+        yield line
+    for x in rows:
+        yield x
+
+def _read_file_marker(inPath, style, encoding):
+    """Return the parsed marker ending a comment block file, or None if it is not marked"""
+    with io.open(inPath, mode="rb") as bFile: # Quick look at the end first
+        bFile.seek(0, 2)
+        bFile.seek(max(bFile.tell() - 8192, 0))
+        if b"cbm:" not in bFile.read():
+            return None
+    tail = [] # Lines from the last one that can not be near the end of a marked block
+    with io.open(inPath, mode="r", encoding=encoding) as iFile:
+        for line in _iter_split_lines(iFile):
+            if (line == "" or line.startswith(style.markerStarts) or 
+                    line.strip(style.borderChars) == ""):
+                tail.append(line)
+            else:
+                tail = []
+    found = _find_marker(tail, style)
+    return found[0] if found is not None else None
+
+_markerTokenRe = re.compile(r"([a-z])([0-9.]*)")
+
+def _parse_marker(payload):
+    """Return a dict of the parts of a marker, raising _MarkerMismatch if it is not valid"""
+    marker = {"checksum": None, "endsWithBreak": False, "padCount": 0, "align": "left", 
+                "records": []}
+    record = None
+    end = 0
+    try:
+        for match in _markerTokenRe.finditer(payload):
+            if match.start() != end:
+                break
+            end = match.end()
+            letter, number = match.groups()
+            if letter in "btp": # Kind, count, spaces before and after, between, leading, 
+                # trailing, and tabs
+                record = [letter, int(number or 1), 0, 0, {}, {}, {}, []]
+                marker["records"].append(record)
+            elif record is None: # Options of the block come first
+                if letter == "v" and number != "1":
+                    raise ValueError("Unknown marker version " + number)
+                elif letter == "c":
+                    marker["checksum"] = int(number)
+                elif letter == "n":
+                    marker["endsWithBreak"] = True
+                elif letter == "d":
+                    marker["padCount"] = int(number)
+                elif letter == "a":
+                    marker["align"] = "center" if number == "1" else "left"
+                elif letter != "v":
+                    raise ValueError("Unknown marker option " + letter)
+            elif letter in "he":
+                record["he".index(letter) + 2] = int(number)
+            elif letter in "glr":
+                i, count = number.split(".")
+                record["glr".index(letter) + 4][int(i)] = int(count)
+            elif letter == "x":
+                record[7].append(int(number))
+            else:
+                raise ValueError("Unknown marker record " + letter)
+    except ValueError as e:
+        raise _MarkerMismatch(str(e))
+    if end != len(payload) or marker["checksum"] is None:
+        raise _MarkerMismatch("Marker is incomplete")
+    return marker
+
+def _iter_exact_lines(blockLines, marker, style):
+    """Generate the plain lines of a marked comment block, from its lines and parsed marker
+    
+    _MarkerMismatch is raised once all lines are generated if the block was
+    edited after it was marked, so they are not to be used before then.
+    """
+    rows = iter(blockLines)
+    textStart, textEnd = len(style.prefix), -len(style.suffix)
+    for x in range(1 + marker["padCount"]): # Border and padding
+        _next_row(rows)
+    checksum = 0
+    for kind, count, head, tail, gaps, leads, trails, tabs in marker["records"]:
+        if kind == "b":
+            for x in range(count):
+                if _next_row(rows)[textStart:textEnd].strip(" "):
+                    raise _MarkerMismatch("Blank line expected")
+                checksum = zlib.crc32(b"\n", checksum)
+                yield ""
+            continue
+        pieces = [_next_row(rows)[textStart:textEnd].strip(" ") 
+                    for x in range(1 if kind == "t" else count)]
+        try:
+            for i, lead in leads.items():
+                pieces[i] = " "*lead + pieces[i]
+            for i, trail in trails.items():
+                pieces[i] = pieces[i] + " "*trail
+        except IndexError:
+            raise _MarkerMismatch("Spaces recorded for a block line that is not there")
+        if kind == "t":
+            paragraph = Paragraph("title", "center", tuple(pieces), (count,), tuple(tabs))
+        else:
+            spacing = [head]
+            if pieces:
+                spacing.extend([gaps.get(i, 1) for i in range(1, count)])
+                spacing.append(tail)
+            paragraph = Paragraph("text", marker["align"], tuple(pieces), tuple(spacing), 
+                                    tuple(tabs))
+        line = paragraph.plain()
+        checksum = zlib.crc32(_utf8(line + "\n"), checksum)
+        yield line
+    for x in range(marker["padCount"]):
+        _next_row(rows)
+    if (not _next_row(rows).startswith(style.markerStarts) or 
+            checksum & 0xffffffff != marker["checksum"]):
+        raise _MarkerMismatch("Comment block was changed after it was marked")
+
+def _next_row(rows):
+    """Return the next line of a marked comment block, raising _MarkerMismatch if none is left"""
+    row = next(rows, None)
+    if row is None:
+        raise _MarkerMismatch("Comment block is shorter than its marker")
+    return row
+
+def _wrap_spans(line, width):
+    """Return (start, end) of each line textwrap would wrap a single paragraph into
+    
+    Wrapped lines are always slices of the paragraph, as whitespace is only
+    dropped where it is broken. This does the greedy fill of textwrap.wrap,
+    with replace_whitespace False, for printable ASCII text, finding each
+    break directly in the string. Only words with hyphens are split into
+    chunks the way textwrap does. Other text is left to a TextWrapper, by
+    _layout(), which only passes printable ASCII here.
+    """
+    spans = []
+    lineLen = len(line)
+    start = 0
+    while start < lineLen:
+        if spans and line[start] == " ": # Whitespace is dropped at the start of lines but the first
+            start = _spacesRe.match(line, start).end()
+            continue
+        limit = start + max(width, 1)
+        if limit >= lineLen: # The rest fits
+            end = lineLen
+            if line[end-1] == " ": # Whitespace is dropped at the end of lines
+                end = start + len(line[start:end].rstrip(" "))
+            if end > start:
+                spans.append((start, end))
+            break
+        # Find the chunk that does not fit, starting at brk, or at start if none does
+        if line[limit] == " ":
+            if line[limit-1] == " ":
+                brk = start + len(line[start:limit].rstrip(" "))
+            else:
+                brk = limit
+            brkEnd = _spacesRe.match(line, brk).end()
+        else: # Looking no further than needed, so that very long words take linear time
+            wordStart = line.rfind(" ", start, limit) + 1 or start
+            brkEnd = line.find(" ", limit, limit + width + 1)
+            if brkEnd == -1: brkEnd = min(limit + width + 1, lineLen)
+            brk = wordStart
+            if "-" in line[wordStart:brkEnd]: # Break within the word if textwrap would
+                if (wordStart == start and start > 0 and line[start-1] != " " or 
+                        brkEnd < lineLen and line[brkEnd] != " "): # Only part of the word is known
+                    return _wrap_spans_textwrap(line, width)
+                for x in _hyphenChunksRe.split(line[wordStart:brkEnd]):
+                    wordStart += len(x)
+                    if wordStart > limit:
+                        brkEnd = wordStart
+                        break
+                    brk = wordStart
+        if brkEnd - brk > width: # Too long for any line, broken to fill this one
+            if line[brk] != " " and "-" in line[brk:brkEnd]: # Python versions differ here
+                return _wrap_spans_textwrap(line, width)
+            if line[brk] != " " and brk < limit:
+                spans.append((start, limit))
+            elif brk > start: # Piece of whitespace, or empty, is dropped
+                spans.append((start, brk))
+            start = limit
+        else:
+            end = brk
+            if line[end-1] == " ":
+                end = start + len(line[start:end].rstrip(" "))
+            if end > start:
+                spans.append((start, end))
+            start = brk
+    return spans
+
+def _wrap_spans_textwrap(line, width, wide=False):
+    """Return (start, end) of each line textwrap.wrap() wraps line into, by columns if wide"""
+    wrapper = _wrappers.get((width, wide))
+    if wrapper is None:
+        wrapperClass = _WideTextWrapper if wide else tw.TextWrapper
+        wrapper = _wrappers[width, wide] = wrapperClass(width=width, replace_whitespace=False)
+    spans = []
+    pos = 0
+    for x in wrapper.wrap(line):
+        # Only the first line can start with whitespace, so the first match is the slice
+        start = line.find(x, pos)
+        pos = start + len(x)
+        spans.append((start, pos))
+    return spans
+
+def _fit_spans(line, width, wide=False):
+    """Return (start, end) of each line of the optimal fit of line into width, by columns if wide
+    
+    Lines are broken between words, at runs of spaces, and after hyphens
+    where textwrap would break them, so that the sum of the squares of the
+    columns left over on each line but the last is least. A line with a word
+    too long for any line is wrapped greedily instead, as textwrap does.
+    As the cost of a line meets the quadrangle inequality, a later line start
+    that is better for ending a line at one word is better for all words
+    after it, so the starts worth trying are kept in a queue, each with the
+    first word it is best for, found by a binary search over the words that
+    fit on a line. This takes O(n log m) time for n words of at most m a
+    line, rather than the O(n*m) of trying every start for every word.
+    """
+    width = max(width, 1)
+    measure = text_width if wide else len
+    starts, ends = [], [] # Of each word, or piece of a word broken after a hyphen
+    colStarts, colEnds = [], [] # Columns taken before the start and end of each word
+    column = pos = 0
+    for start, end in _iter_fit_words(line):
+        if not starts and measure(line[:end]) <= width: # Leading spaces stay, as in textwrap
+            start = 0
+        column += measure(line[pos:start])
+        wordWidth = measure(line[start:end])
+        if wordWidth > width: # Broken to fill lines, which only greedy filling does
+            return _wrap_spans_textwrap(line, width, wide)
+        starts.append(start)
+        ends.append(end)
+        colStarts.append(column)
+        colEnds.append(column + wordWidth)
+        column += wordWidth
+        pos = end
+    numWords = len(starts)
+    if numWords == 0:
+        return []
+    
+    def cost(i, j):
+        """Return the least cost of the words before j with a line of words i to j-1 last"""
+        used = colEnds[j-1] - colStarts[i]
+        return best[i] + (width - used)**2 if used <= width else _infinity
+    
+    best = [0]*numWords # Least cost of the words before each, ending a line there
+    previous = [0]*numWords # Start of the line ending there at that cost
+    candidates, firsts = [0], [1] # Line starts, and the first word each is best to end at
+    head = 0
+    for j in range(1, numWords):
+        while head + 1 < len(candidates) and firsts[head+1] <= j:
+            head += 1
+        previous[j] = candidates[head]
+        best[j] = cost(candidates[head], j)
+        firsts[head] = j + 1
+        # A line starting at word j is best from the first word it is no worse for
+        while len(candidates) > head and cost(j, firsts[-1]) <= cost(candidates[-1], firsts[-1]):
+            candidates.pop()
+            firsts.pop()
+        if len(candidates) == head:
+            candidates.append(j)
+            firsts.append(j + 1)
+            continue
+        # Past the words that fit on a line after the last start, j is the better one
+        lo, hi = firsts[-1] + 1, min(bisect_right(colEnds, colStarts[candidates[-1]] + width), 
+                                        numWords - 1) + 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if cost(j, mid) <= cost(candidates[-1], mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        if lo < numWords:
+            candidates.append(j)
+            firsts.append(lo)
+    # The last line costs nothing, so any start from which the rest fits may do
+    last = numWords - 1
+    for i in range(numWords - 2, -1, -1):
+        if colEnds[-1] - colStarts[i] > width:
+            break
+        if best[i] <= best[last]:
+            last = i
+    spans = []
+    j = numWords
+    i = last
+    while j:
+        spans.append((starts[i], ends[j-1]))
+        j = i
+        i = previous[i]
+    spans.reverse()
+    return spans
+
+def _iter_fit_words(line):
+    """Generate (start, end) of each word of line, and of each piece of a word with hyphens
+    that textwrap breaks it into"""
+    for match in _wordRe.finditer(line):
+        start, end = match.span()
+        if "-" not in line[start:end]:
+            yield start, end
+            continue
+        for x in _hyphenChunksRe.split(line[start:end]):
+            if x:
+                yield start, start + len(x)
+                start += len(x)
+
+_wrappers = {} # TextWrapper for each width, and whether it wraps by columns
+_otherCharsRe = re.compile(r"[^\x20-\x7e]") # Anything but printable ASCII
+_spacesRe = re.compile(r" *")
+_wordRe = re.compile(r"[^ ]+") # Words as optimal fit breaks between them
+_infinity = float("inf")
+# Chunks as TextWrapper splits them when breaking on hyphens
+try: # Python 2 uses a separate pattern for unicode strings
+    _hyphenChunksRe = tw.TextWrapper.wordsep_re_uni
+except AttributeError:
+    _hyphenChunksRe = tw.TextWrapper.wordsep_re
+
+class _LRUCache(object):
+    """Cache of limited size discarding the least recently used items, counting hits and misses"""
+    
+    def __init__(self, maxSize, sizeOf=None):
+        """Create the cache, with sizeOf giving the size of a (key, value), 1 if not given"""
+        self.maxSize = maxSize
+        self.sizeOf = sizeOf
+        self.size = self.hits = self.misses = 0
+        self._items = OrderedDict()
+    
+    def get(self, key):
+        """Return the value cached for key, or None"""
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._items[key] = value # Now most recently used
+        self.hits += 1
+        return value
+    
+    def put(self, key, value):
+        """Cache value for key, discarding the least recently used items to make room"""
+        itemSize = self.sizeOf(key, value) if self.sizeOf else 1
+        if itemSize > self.maxSize // 4: # Would push out too much
+            return
+        if key in self._items:
+            return
+        self._items[key] = value
+        self.size += itemSize
+        while self.size > self.maxSize:
+            oldKey, oldValue = self._items.popitem(last=False)
+            self.size -= self.sizeOf(oldKey, oldValue) if self.sizeOf else 1
+    
+    def clear(self):
+        """Empty the cache and reset its counters"""
+        self._items.clear()
+        self.size = self.hits = self.misses = 0
+    
+    def info(self):
+        """Return a dict of the hits, misses, number of items, size and maximum size"""
+        return {"hits": self.hits, "misses": self.misses, "items": len(self._items), 
+                "size": self.size, "maxSize": self.maxSize}
+
+# Rendered lines of paragraphs, sized in characters, so that repeated ones are wrapped once
+_paragraphCache = _LRUCache(2**22, lambda key, rows: len(key[0]) + len(rows)*key[1].width)
+
+def wrap_cache_info():
+    """Return a dict of hits, misses, items, size and maxSize of the paragraph cache"""
+    return _paragraphCache.info()
+
+def clear_wrap_cache():
+    """Empty the paragraph cache and reset its counters"""
+    _paragraphCache.clear()
+
+def _convert_key(plainText, alignCenter, centerTitles, padCount, style, exact=False, 
+                optimalFit=False):
+    """Return the key in the GUI's result cache of converting plainText with the options"""
+    return ("convert", _text_digest(plainText), alignCenter, centerTitles, padCount, 
+            style, bool(exact), bool(optimalFit))
+
+def _revert_key(commentBlock, style):
+    """Return the key in the GUI's result cache of reverting commentBlock"""
+    return ("revert", _text_digest(commentBlock), style)
+
+def _text_digest(text):
+    """Return a hash of text, for the result cache to hold instead of the text"""
+    import hashlib # Only here, to keep the start up quick
+    return hashlib.sha1(_utf8(text)).digest()
+
+def _utf8(text):
+    """Return text encoded as UTF-8, unless already bytes"""
+    if isinstance(text, _textType):
+        try:
+            return text.encode("utf-8")
+        except UnicodeError: # Lone surrogates, as pasted on some systems
+            return text.encode("utf-8", "surrogatepass")
+    return text
+
+def _iter_text_lines(plainText, ends=None):
+    """Generate the lines of a string or of an iterable of strings, as splitlines() would
+    
+    If ends is a list, the last character of the text is put in it.
+    """
+    if isinstance(plainText, _stringTypes):
+        if ends is not None:
+            ends[:] = [plainText[-1:]]
+        for line in plainText.splitlines():
+            yield line
+    else:
+        for chunk in plainText:
+            if ends is not None and chunk:
+                ends[:] = [chunk[-1:]]
+            for line in chunk.splitlines():
+                yield line
+
+def convert_file(inPath, outPath, alignCenter, centerTitles, padCount, style, encoding="utf-8", 
+                progress=None, exact=False, jobs=1, optimalFit=False):
+    """Convert a plain text file to a comment block file, without reading it all into memory
+    
+    The input is read a line at a time and the block is written to a
+    temporary file, which replaces outPath once complete. progress, if
+    given, is called every so often with the fraction of the input read;
+    an exception raised by it stops the conversion, leaving outPath as it was.
+    If exact, the block is marked for an exact revert. A file of more than
+    _parallelThreshold bytes is converted in chunks by jobs worker processes,
+    one per CPU if 0, unless exact. If optimalFit, paragraphs are wrapped
+    for the least ragged right edge.
+    """
+    numJobs = jobs or _cpu_count()
+    with io.open(inPath, mode="r", encoding=encoding) as iFile:
+        lines = _iter_file_progress(iFile, progress)
+        if numJobs > 1 and not exact and os.path.getsize(inPath) > _parallelThreshold:
+            blockLines = _iter_parallel_block(_iter_text_lines(lines), alignCenter, centerTitles, 
+                                                padCount, style, numJobs, optimalFit)
+        else:
+            blockLines = iter_comment_lines(lines, alignCenter, centerTitles, padCount, style, 
+                                            exact, optimalFit)
+        _write_atomic(outPath, _iter_joined(blockLines, "\n"), encoding)
+
+def revert_file(inPath, outPath, style, encoding="utf-8", progress=None):
+    """Revert a comment block file to a plain text file, as convert_file() converts
+    
+    A block marked for an exact revert is read twice, first for its marker.
+    """
+    marker = _read_file_marker(inPath, style, encoding)
+    if marker is not None:
+        try:
+            with io.open(inPath, mode="r", encoding=encoding) as iFile:
+                blockLines = _iter_split_lines(_iter_file_progress(iFile, progress))
+                plainLines = _iter_exact_lines(blockLines, marker, style)
+                _write_atomic(outPath, _iter_joined(plainLines, "\n" if marker["endsWithBreak"] 
+                                                                    else ""), encoding)
+            return
+        except _MarkerMismatch: # Edited since, so reverted as if not marked
+            pass
+    with io.open(inPath, mode="r", encoding=encoding) as iFile:
+        # As from split("\n") of the whole file, a last line break is followed by an empty line
+        lines = _iter_file_progress(iFile, progress)
+        blockLines = _iter_split_lines(lines)
+        if marker is not None:
+            blockLines = _iter_unmarked_rows(blockLines, style)
+        _write_atomic(outPath, _iter_joined(iter_plain_lines(blockLines, style)), encoding)
+
+def convert_stream(iFile, oFile, alignCenter, centerTitles, padCount, style, exact=False, 
+                    optimalFit=False):
+    """Convert the lines of an open text file, writing each block line to oFile once made
+    
+    Only one paragraph is held at a time, but if exact, the marker keeps a
+    short record of every paragraph until the end.
+    """
+    for line in iter_comment_lines(iFile, alignCenter, centerTitles, padCount, style, exact, 
+                                    optimalFit):
+        if not isinstance(line, _textType): # Python 2 str, of borders
+            line = line.decode("ascii")
+        oFile.write(line + "\n")
+
+def revert_stream(iFile, oFile, style):
+    """Revert the comment block lines of an open text file, writing each plain line to
+    oFile once joined
+    
+    A marker for an exact revert is left out, as it is only of use with the
+    whole block at hand, as with revert_file(), but lines of text starting
+    with "cbm:" are kept.
+    """
+    blockLines = _iter_unmarked_rows(_iter_split_lines(iFile), style)
+    separator = ""
+    for line in iter_plain_lines(blockLines, style):
+        line = separator + line
+        if not isinstance(line, _textType): # Python 2 str, of empty lines
+            line = line.decode("ascii")
+        oFile.write(line)
+        separator = "\n"
+
+class _FlushingReader(io.RawIOBase):
+    """Raw reader of a file descriptor that flushes an output file before each read
+    
+    Reading a pipe waits for more input, so what has been written so far is
+    passed on first, without flushing after every line.
+    """
+    
+    def __init__(self, fileDescriptor, oFile):
+        """Read fileDescriptor, flushing oFile"""
+        io.RawIOBase.__init__(self)
+        self.fileDescriptor = fileDescriptor
+        self.oFile = oFile
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        """Flush the output, then read what is available into buffer"""
+        self.oFile.flush()
+        data = os.read(self.fileDescriptor, len(buffer))
+        memoryview(buffer)[:len(data)] = data
+        return len(data)
+
+def _iter_file_progress(iFile, progress):
+    """Generate the lines of an open file, reporting the fraction read to progress"""
+    if progress is None:
+        for line in iFile:
+            yield line
+        return
+    fileSize = max(os.fstat(iFile.fileno()).st_size, 1)
+    progress(0.0)
+    for i, line in enumerate(iFile):
+        if i % 1024 == 0: # Position of the buffer is ahead of the line, by little
+            progress(min(iFile.buffer.tell() / float(fileSize), 1.0))
+        yield line
+    progress(1.0)
+
+def _iter_split_lines(lines):
+    """Generate lines without their line breaks, as split("\n") of them joined would"""
+    line = "\n" # No lines is one empty line
+    for line in lines:
+        yield line[:-1] if line.endswith("\n") else line
+    if line.endswith("\n"):
+        yield ""
+
+def _iter_joined(lines, end=""):
+    """Generate "\n".join(lines) + end in chunks of many lines, for buffered writing"""
+    lines = iter(lines)
+    separator = ""
+    while True:
+        chunk = list(islice(lines, 1024))
+        if not chunk:
+            break
+        yield separator + "\n".join(chunk)
+        separator = "\n"
+    yield end
+
+def _write_atomic(filePath, chunks, encoding):
+    """Write an iterable of strings to filePath through a temporary file, replacing it when done,
+    or of bytes-like objects if encoding is None"""
+    dirPath, fileName = os.path.split(os.path.abspath(filePath))
+    if os.path.exists(filePath):
+        fileMode = os.stat(filePath).st_mode & 0o777
+    else: # Permissions a new file would get
+        umask = os.umask(0)
+        os.umask(umask)
+        fileMode = 0o666 & ~umask
+    handle, tempPath = tempfile.mkstemp(prefix="."+fileName+".", suffix=".tmp", dir=dirPath)
+    try:
+        with io.open(handle, mode="w" if encoding else "wb", encoding=encoding, 
+                        newline="" if encoding else None) as oFile:
+            for chunk in chunks:
+                if encoding and not isinstance(chunk, _textType): # Python 2 str
+                    chunk = chunk.decode("ascii")
+                oFile.write(chunk)
+        os.chmod(tempPath, fileMode)
+        try:
+            os.replace(tempPath, filePath)
+        except AttributeError: # Python 2, where rename replaces atomically on POSIX only
+            if os.name == "nt" and os.path.exists(filePath):
+                os.remove(filePath)
+            os.rename(tempPath, filePath)
+    except:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+def _convert_file_job(job):
+    """Convert or revert one file for batch mode, returning an error message or None"""
+    inPath, outPath, mode, options = job
+    try:
+        outDir = os.path.dirname(outPath)
+        if outDir and not os.path.isdir(outDir):
+            try:
+                os.makedirs(outDir)
+            except OSError: # Made meanwhile by another worker
+                pass
+        if mode == "convert":
+            convert_file(inPath, outPath, options["alignCenter"], options["centerTitles"], 
+                        options["padCount"], get_style(*options["style"]), options["encoding"], 
+                        exact=options["exact"], jobs=options.get("jobs", 1), 
+                        optimalFit=options["optimalFit"])
+        else:
+            revert_file(inPath, outPath, get_style(*options["style"]), options["encoding"])
+    except Exception as e:
+        return "Error processing file " + inPath + ": " + str(e)
+    return None
+
+
+# --------------------- DISPLAY WIDTH ---------------------
+# In a monospaced font most characters take a column, but East Asian wide characters and
+# emoji take two, and combining marks none. Lines are wrapped and padded by columns, so
+# that the right border stays straight. Printable ASCII never needs the table of ranges
+# below, of Unicode 14, which is only read into arrays when first needed
+
+# Combining marks and format characters, which take no column of their own
+_zeroWidthRanges = (
+    "300-36f 483-489 591-5bd 5bf 5c1-5c2 5c4-5c5 5c7 600-605 610-61a 61c 64b-65f 670 6d6-6dd "
+    "6df-6e4 6e7-6e8 6ea-6ed 70f 711 730-74a 7a6-7b0 7eb-7f3 7fd 816-819 81b-823 825-827 "
+    "829-82d 859-85b 890-89f 8ca-902 93a 93c 941-948 94d 951-957 962-963 981 9bc 9c1-9c4 9cd "
+    "9e2-9e3 9fe-a02 a3c a41-a51 a70-a71 a75 a81-a82 abc ac1-ac8 acd ae2-ae3 afa-b01 b3c b3f "
+    "b41-b44 b4d-b56 b62-b63 b82 bc0 bcd c00 c04 c3c c3e-c40 c46-c56 c62-c63 c81 cbc cbf cc6 "
+    "ccc-ccd ce2-ce3 d00-d01 d3b-d3c d41-d44 d4d d62-d63 d81 dca dd2-dd6 e31 e34-e3a e47-e4e "
+    "eb1 eb4-ebc ec8-ecd f18-f19 f35 f37 f39 f71-f7e f80-f84 f86-f87 f8d-fbc fc6 102d-1030 "
+    "1032-1037 1039-103a 103d-103e 1058-1059 105e-1060 1071-1074 1082 1085-1086 108d 109d "
+    "1160-11ff 135d-135f 1712-1714 1732-1733 1752-1753 1772-1773 17b4-17b5 17b7-17bd 17c6 "
+    "17c9-17d3 17dd 180b-180f 1885-1886 18a9 1920-1922 1927-1928 1932 1939-193b 1a17-1a18 1a1b "
+    "1a56 1a58-1a60 1a62 1a65-1a6c 1a73-1a7f 1ab0-1b03 1b34 1b36-1b3a 1b3c 1b42 1b6b-1b73 "
+    "1b80-1b81 1ba2-1ba5 1ba8-1ba9 1bab-1bad 1be6 1be8-1be9 1bed 1bef-1bf1 1c2c-1c33 1c36-1c37 "
+    "1cd0-1cd2 1cd4-1ce0 1ce2-1ce8 1ced 1cf4 1cf8-1cf9 1dc0-1dff 200b-200f 202a-202e 2060-206f "
+    "20d0-20f0 2cef-2cf1 2d7f 2de0-2dff 302a-302d 3099-309a a66f-a672 a674-a67d a69e-a69f "
+    "a6f0-a6f1 a802 a806 a80b a825-a826 a82c a8c4-a8c5 a8e0-a8f1 a8ff a926-a92d a947-a951 "
+    "a980-a982 a9b3 a9b6-a9b9 a9bc-a9bd a9e5 aa29-aa2e aa31-aa32 aa35-aa36 aa43 aa4c aa7c aab0 "
+    "aab2-aab4 aab7-aab8 aabe-aabf aac1 aaec-aaed aaf6 abe5 abe8 abed fb1e fe00-fe0f fe20-fe2f "
+    "feff fff9-fffb 101fd 102e0 10376-1037a 10a01-10a0f 10a38-10a3f 10ae5-10ae6 10d24-10d27 "
+    "10eab-10eac 10f46-10f50 10f82-10f85 11001 11038-11046 11070 11073-11074 1107f-11081 "
+    "110b3-110b6 110b9-110ba 110bd 110c2-110cd 11100-11102 11127-1112b 1112d-11134 11173 "
+    "11180-11181 111b6-111be 111c9-111cc 111cf 1122f-11231 11234 11236-11237 1123e 112df "
+    "112e3-112ea 11300-11301 1133b-1133c 11340 11366-11374 11438-1143f 11442-11444 11446 1145e "
+    "114b3-114b8 114ba 114bf-114c0 114c2-114c3 115b2-115b5 115bc-115bd 115bf-115c0 115dc-115dd "
+    "11633-1163a 1163d 1163f-11640 116ab 116ad 116b0-116b5 116b7 1171d-1171f 11722-11725 "
+    "11727-1172b 1182f-11837 11839-1183a 1193b-1193c 1193e 11943 119d4-119db 119e0 11a01-11a0a "
+    "11a33-11a38 11a3b-11a3e 11a47 11a51-11a56 11a59-11a5b 11a8a-11a96 11a98-11a99 11c30-11c3d "
+    "11c3f 11c92-11ca7 11caa-11cb0 11cb2-11cb3 11cb5-11cb6 11d31-11d45 11d47 11d90-11d91 11d95 "
+    "11d97 11ef3-11ef4 13430-13438 16af0-16af4 16b30-16b36 16f4f 16f8f-16f92 16fe4 1bc9d-1bc9e "
+    "1bca0-1cf46 1d167-1d169 1d173-1d182 1d185-1d18b 1d1aa-1d1ad 1d242-1d244 1da00-1da36 "
+    "1da3b-1da6c 1da75 1da84 1da9b-1daaf 1e000-1e02a 1e130-1e136 1e2ae 1e2ec-1e2ef 1e8d0-1e8d6 "
+    "1e944-1e94a e0001-e01ef")
+# East Asian wide and fullwidth characters, emoji among them, which take two columns
+_wideRanges = (
+    "1100-115f 231a-231b 2329-232a 23e9-23ec 23f0 23f3 25fd-25fe 2614-2615 2648-2653 267f 2693 "
+    "26a1 26aa-26ab 26bd-26be 26c4-26c5 26ce 26d4 26ea 26f2-26f3 26f5 26fa 26fd 2705 270a-270b "
+    "2728 274c 274e 2753-2755 2757 2795-2797 27b0 27bf 2b1b-2b1c 2b50 2b55 2e80-3029 302e-303e "
+    "3041-3096 309b-3247 3250-4dbf 4e00-a4c6 a960-a97c ac00-d7a3 f900-fad9 fe10-fe19 fe30-fe6b "
+    "ff01-ff60 ffe0-ffe6 16fe0-16fe3 16ff0-1b2fb 1f004 1f0cf 1f18e 1f191-1f19a 1f200-1f320 "
+    "1f32d-1f335 1f337-1f37c 1f37e-1f393 1f3a0-1f3ca 1f3cf-1f3d3 1f3e0-1f3f0 1f3f4 1f3f8-1f43e "
+    "1f440 1f442-1f4fc 1f4ff-1f53d 1f54b-1f54e 1f550-1f567 1f57a 1f595-1f596 1f5a4 1f5fb-1f64f "
+    "1f680-1f6c5 1f6cc 1f6d0-1f6d2 1f6d5-1f6df 1f6eb-1f6ec 1f6f4-1f6fc 1f7e0-1f7f0 1f90c-1f93a "
+    "1f93c-1f945 1f947-1f9ff 1fa70-1faf6 20000-3fffd")
+
+_firstOddChar = 0x300 # Characters before this all take one column
+_widthStarts = _widthEnds = _widthValues = None # Arrays of the ranges, once read
+
+def _load_width_table():
+    """Read the ranges of characters that are not one column wide into arrays"""
+    global _widthStarts, _widthEnds, _widthValues
+    ranges = []
+    for text, width in ((_zeroWidthRanges, 0), (_wideRanges, 2)):
+        for x in text.split():
+            start, sep, end = x.partition("-")
+            ranges.append((int(start, 16), int(end or start, 16), width))
+    ranges.sort()
+    _widthEnds = array("l", [x[1] for x in ranges])
+    _widthValues = array("b", [x[2] for x in ranges])
+    _widthStarts = array("l", [x[0] for x in ranges]) # Last, as it tells that all are read
+
+def char_width(char):
+    """Return the number of columns a character takes in a monospaced font, 0, 1 or 2"""
+    code = ord(char)
+    if code < _firstOddChar:
+        return 1
+    if _widthStarts is None:
+        _load_width_table()
+    i = bisect_right(_widthStarts, code) - 1
+    if i >= 0 and code <= _widthEnds[i]:
+        return _widthValues[i]
+    return 1
+
+def text_width(text):
+    """Return the number of columns text takes in a monospaced font"""
+    if _otherCharsRe.search(text) is None: # Printable ASCII, a column each
+        return len(text)
+    return sum([char_width(x) for x in text])
+
+def _has_odd_widths(text):
+    """Return True if text has a character that is not one column wide"""
+    for x in text:
+        if ord(x) >= _firstOddChar and char_width(x) != 1:
+            return True
+    return False
+
+def _width_index(text, columns):
+    """Return how many characters from the start of text fit in columns, with any
+    combining marks after the last of them"""
+    used = 0
+    for i, x in enumerate(text):
+        used += char_width(x)
+        if used > columns:
+            return i
+    return len(text)
+
+def _render_wide_rows(alignCenter, pieces, style):
+    """Return the block lines of pieces of text as a tuple, padded by columns"""
+    prefix, suffix = style.prefix, style.suffix
+    rows = []
+    if alignCenter: # Extra space on the side str.center() puts it
+        width = style.innerWidth
+        for x in pieces:
+            margin = max(width - text_width(x), 0)
+            left = margin // 2 + (margin & width & 1)
+            rows.append(prefix + " "*left + x + " "*(margin - left) + suffix)
+    else:
+        width = style.innerWidth - 2
+        for x in pieces:
+            rows.append(style.indent + x + " "*(width - text_width(x)) + suffix)
+    return tuple(rows)
+
+class _WideTextWrapper(tw.TextWrapper):
+    """TextWrapper measuring text in columns rather than characters"""
+    
+    def _wrap_chunks(self, chunks):
+        """Return the lines filled greedily with chunks, as TextWrapper does"""
+        lines = []
+        chunks.reverse() # Taken from the end
+        while chunks:
+            line = []
+            lineWidth = 0
+            if self.drop_whitespace and chunks[-1].strip() == "" and lines:
+                del chunks[-1]
+            while chunks:
+                chunkWidth = text_width(chunks[-1])
+                if lineWidth + chunkWidth > self.width:
+                    break
+                line.append(chunks.pop())
+                lineWidth += chunkWidth
+            if chunks and text_width(chunks[-1]) > self.width:
+                self._handle_long_word(chunks, line, lineWidth, self.width)
+            if self.drop_whitespace and line and line[-1].strip() == "":
+                del line[-1]
+            if line:
+                lines.append("".join(line))
+        return lines
+    
+    def _handle_long_word(self, chunks, line, lineWidth, width):
+        """Fill the rest of the line with the start of a chunk too wide for any line"""
+        end = _width_index(chunks[-1], width - lineWidth)
+        if end == 0 and not line: # A wide character in a single column still goes on
+            end = 1
+        if end:
+            line.append(chunks[-1][:end])
+            chunks[-1] = chunks[-1][end:]
+
+
+# --------------------- FIXED STRIDE BLOCKS ---------------------
+# Every line of a comment block is as wide as the block, so a block of printable ASCII
+# text is rendered straight into one buffer of the size it will have, each line at a
+# fixed offset, without a string for each line, nor one for the whole block
+
+_mapThreshold = 2**24 # Bytes of a buffer from which it is an anonymous memory map
+_fixedStrideRe = re.compile(r"[^\x20-\x7e\t\r\n]") # Characters a fixed stride can not take
+
+class BlockBuffer(object):
+    """Comment block held as bytes, each line as wide as the block and followed by a line break
+    
+    Line n starts at byte n*stride. data is a bytearray, or for a large block
+    an anonymous memory map, which close() gives back to the system at once.
+    """
+    __slots__ = ("data", "stride", "numLines")
+    
+    def __init__(self, data, stride, numLines):
+        """Create the block from its buffer, the bytes of a line with its break, and its lines"""
+        self.data = data
+        self.stride = stride
+        self.numLines = numLines
+    
+    def __len__(self):
+        """Return the number of lines"""
+        return self.numLines
+    
+    def view(self):
+        """Return a memoryview of the whole block, ending with a line break, without copying"""
+        return memoryview(self.data)
+    
+    def line(self, n):
+        """Return a memoryview of line n, without its line break, without copying"""
+        if not 0 <= n < self.numLines:
+            raise IndexError("Line %d not in a block of %d lines" % (n, self.numLines))
+        start = n * self.stride
+        return memoryview(self.data)[start:start + self.stride - 1]
+    
+    def text(self, first=0, last=None):
+        """Return the lines from first to before last as a string, joined with line breaks,
+        as convert_to_comment() returns the whole block"""
+        if last is None or last > self.numLines:
+            last = self.numLines
+        if last <= first:
+            return ""
+        return self.data[first * self.stride:last * self.stride - 1].decode("ascii")
+    
+    def save(self, filePath):
+        """Write the block to a file, with a line break at the end, replacing it when done"""
+        _write_atomic(filePath, [self.view()], None)
+    
+    def close(self):
+        """Give back the memory of a memory map, once no memoryview of it is in use"""
+        if not isinstance(self.data, bytearray):
+            self.data.close()
+
+def render_block(plainText, alignCenter, centerTitles, padCount, style, optimalFit=False, 
+                    feed=iter):
+    """Return a BlockBuffer of the comment block convert_to_comment() makes of plainText, not
+    marked, raising ValueError if the text is not printable ASCII, tabs and line breaks
+    
+    The lines are laid out first, keeping only where the pieces of text go,
+    then written into a buffer of the exact size of the block, which is all
+    the memory taken besides the lines of the text. The lines are read
+    through feed(lines) when laid out, such as to report progress.
+    """
+    found = _fixedStrideRe.search(plainText)
+    if found is not None:
+        raise ValueError("Only printable ASCII text has a fixed stride, not %r" % found.group())
+    lines = plainText.splitlines()
+    prefixLen, indentLen = len(style.prefix), len(style.indent)
+    innerWidth, textWidth = style.innerWidth, style.textWidth
+    stride = len(style.border) + 1
+    counts = array("L") # Block lines of each line of text
+    pieces = array("l") # Start and end of the text of each block line, and where it goes
+    offset = (1 + padCount) * stride
+    for line in feed(lines):
+        if line == "":
+            counts.append(1)
+            pieces.extend((0, 0, 0))
+            offset += stride
+            continue
+        expanded, spans, wide = _layout(line, centerTitles, textWidth, optimalFit)
+        center = alignCenter
+        if spans is None: # Title, centred without its hyphens
+            spans = ((len(expanded) - len(expanded.lstrip("-")), len(expanded)),)
+            center = True
+        counts.append(len(spans))
+        for i, j in spans:
+            if center: # Extra space on the side str.center() puts it
+                margin = innerWidth - (j - i)
+                pieces.extend((i, j, offset + prefixLen + margin//2 + (margin & innerWidth & 1)))
+            else:
+                pieces.extend((i, j, offset + indentLen))
+            offset += stride
+    numLines = 2 + 2*padCount + sum(counts)
+    data = _new_buffer(numLines * stride, (style.blankLine + "\n").encode("ascii"))
+    border = style.border.encode("ascii")
+    data[:stride-1] = border
+    data[(numLines - 1) * stride:numLines * stride - 1] = border
+    end = 0
+    for n, count in enumerate(counts):
+        line = lines[n]
+        if "\t" in line:
+            line = line.replace("\t", "    ")
+        lineBytes = line.encode("ascii")
+        start, end = end, end + 3*count
+        for k in range(start, end, 3):
+            i, j, offset = pieces[k], pieces[k+1], pieces[k+2]
+            data[offset:offset + j - i] = lineBytes[i:j]
+    return BlockBuffer(data, stride, numLines)
+
+def _new_buffer(size, fill):
+    """Return a writable buffer of size bytes, a multiple of the length of fill, repeating
+    it, which is an anonymous memory map if large and one can be viewed"""
+    if size >= _mapThreshold:
+        try:
+            import mmap
+            data = mmap.mmap(-1, size)
+        except (ImportError, EnvironmentError, ValueError):
+            data = None
+        if data is not None:
+            try:
+                memoryview(data).release()
+            except (TypeError, AttributeError): # Python 2 maps have no memoryview
+                data.close()
+                data = None
+        if data is not None:
+            run = fill * max(2**20 // len(fill), 1)
+            for start in range(0, size, len(run)):
+                data[start:start + len(run)] = run[:size - start]
+            return data
+    return bytearray(fill) * (size // len(fill))
+
+
+# --------------------- MANY TEXTS ---------------------
+
+_parallelThreshold = 2**20 # Characters of texts from which convert_many() uses processes
+_chunkChars = 2**16 # Characters of texts sent to a worker process at a time
+
+def convert_many(texts, alignCenter, centerTitles, padCount, style, exact=False, jobs=0, 
+                lazy=False, optimalFit=False):
+    """Convert each of an iterable of plain texts to a comment block, in order
+    
+    The blocks are put together from the paragraph cache directly, saving the
+    set up of each convert_to_comment().
+    Once the texts come to more than _parallelThreshold characters, they are
+    converted in chunks by jobs worker processes, by default one per CPU,
+    unless jobs is 1. A list is returned, or if lazy, an iterator.
+    """
+    blocks = _iter_many(_convert_chunk, texts, (alignCenter, centerTitles, padCount, style, exact, 
+                                                optimalFit), jobs)
+    return blocks if lazy else list(blocks)
+
+def revert_many(blocks, style, jobs=0, lazy=False):
+    """Revert each of an iterable of comment blocks to plain text, in order, as
+    convert_many() converts
+    """
+    texts = _iter_many(_revert_chunk, blocks, (style,), jobs)
+    return texts if lazy else list(texts)
+
+def _iter_many(work, items, options, jobs):
+    """Generate the results of work((chunk, options)) for chunks of items in order, in worker
+    processes if the items come to more than _parallelThreshold characters
+    """
+    items = iter(items)
+    first = [] # Items read to tell if there are enough for processes
+    size = 0
+    numJobs = jobs or _cpu_count()
+    if numJobs > 1:
+        for item in items:
+            first.append(item)
+            size += len(item)
+            if size > _parallelThreshold:
+                break
+    tasks = ((chunk, options) for chunk in _iter_chunks(chain(first, items)))
+    if size <= _parallelThreshold:
+        for task in tasks:
+            for result in work(task):
+                yield result
+    else:
+        for results in _iter_pool_map(work, tasks, numJobs):
+            for result in results:
+                yield result
+
+def _iter_pool_map(work, tasks, numJobs):
+    """Generate work(task) for each of an iterable of tasks in order, as done by numJobs
+    worker processes
+    
+    Only a few tasks are handed out ahead of the results given back, so a
+    long iterable of tasks is not read into memory all at once.
+    """
+    import multiprocessing
+    from collections import deque
+    pool = multiprocessing.Pool(numJobs)
+    try:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(work, (task,)))
+            if len(pending) > numJobs*2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        pool.close()
+    finally: # Closed, or stopped early if the generator was not used up
+        pool.terminate()
+        pool.join()
+
+def _iter_chunks(items):
+    """Generate lists of items of about _chunkChars characters in all"""
+    chunk = []
+    size = 0
+    for item in items:
+        chunk.append(item)
+        size += len(item)
+        if size >= _chunkChars:
+            yield chunk
+            chunk = []
+            size = 0
+    if chunk:
+        yield chunk
+
+def _convert_chunk(args):
+    """Return the comment blocks of a chunk of texts for convert_many()"""
+    texts, (alignCenter, centerTitles, padCount, style, exact, optimalFit) = args
+    if exact:
+        return ["\n".join(iter_comment_lines(x, alignCenter, centerTitles, padCount, style, True, 
+                                            optimalFit)) for x in texts]
+    # As iter_comment_lines() makes them, less the generator
+    head = [style.border] + [style.blankLine]*padCount
+    tail = [style.blankLine]*padCount + [style.border]
+    blocks = []
+    for text in texts:
+        rows = list(head)
+        for line in text.splitlines():
+            rows.extend(_paragraph_lines(line, alignCenter, centerTitles, style, optimalFit))
+        rows.extend(tail)
+        blocks.append("\n".join(rows))
+    return blocks
+
+def _iter_parallel_block(lines, alignCenter, centerTitles, padCount, style, numJobs, 
+                            optimalFit=False):
+    """Generate the lines of a comment block as iter_comment_lines() does, but with the
+    paragraphs laid out by numJobs worker processes, each chunk as one string of lines
+    
+    Each line of plain text is a paragraph of its own, so the text can be
+    split at any line, and the block lines of the chunks joined are the same.
+    """
+    yield style.border
+    for x in range(padCount):
+        yield style.blankLine
+    tasks = ((chunk, (alignCenter, centerTitles, style, optimalFit)) 
+                for chunk in _iter_chunks(lines))
+    for rows in _iter_pool_map(_convert_lines_chunk, tasks, numJobs):
+        yield rows
+    for x in range(padCount):
+        yield style.blankLine
+    yield style.border
+
+def _convert_lines_chunk(args):
+    """Return the block lines of a chunk of lines of plain text, joined with line breaks"""
+    lines, (alignCenter, centerTitles, style, optimalFit) = args
+    rows = []
+    for line in lines:
+        rows.extend(_paragraph_lines(line, alignCenter, centerTitles, style, optimalFit))
+    return "\n".join(rows)
+
+def _revert_chunk(args):
+    """Return the plain texts of a chunk of comment blocks for revert_many()"""
+    blocks, (style,) = args
+    return [_revert_lines(x.split("\n"), style) for x in blocks]
+
+
+# --------------------- REFLOW ---------------------
+# Comment blocks already in source files are found by their borders, and reverted and
+# converted again, so that their width and options can be changed in place
+
+_reflowRounds = 8 # Times a block is reverted and converted again at most, to settle
+
+def reflow_text(text, alignCenter, centerTitles, padCount, style, exact=False, 
+                optimalFit=False):
+    """Return text, such as of a source file, with each comment block of a CommentStyle in it
+    reverted and converted again with the given options, and the number of blocks
+    
+    A block is a border of the style, of any width, rows of the same width
+    starting and ending with its delimiters, and another border. All rows
+    must have the same indentation, which the new block keeps, as do the line
+    breaks. Padding is taken off before converting. Unless marked, reverting
+    a block is not exact, so the new block is reverted and converted again
+    until it gives back the text it is made from, so that reflowing it again
+    with the same options leaves it as it is.
+    """
+    lines = text.splitlines(True)
+    parts = []
+    numBlocks = 0
+    i = 0
+    for start, end, indent, blockStyle in _iter_block_spans(lines, style):
+        parts.extend(lines[i:start])
+        rows = [x.rstrip("\r\n")[len(indent):] for x in lines[start:end]]
+        plainText = _revert_block(rows, blockStyle)
+        commentBlock = convert_to_comment(plainText, alignCenter, centerTitles, padCount, style, 
+                                            exact, optimalFit=optimalFit)
+        if not exact: # Until the block reverts to the text it is made from, so it stays
+            for x in range(_reflowRounds):
+                revertedText = revert_to_plain(commentBlock, style).strip("\n")
+                if revertedText == plainText:
+                    break
+                plainText = revertedText
+                commentBlock = convert_to_comment(plainText, alignCenter, centerTitles, 
+                                                    padCount, style, optimalFit=optimalFit)
+        blockLines = commentBlock.split("\n")
+        lineBreak = lines[start][len(rows[0]) + len(indent):] or "\n"
+        lastBreak = lines[end-1][len(rows[-1]) + len(indent):]
+        parts.extend([indent + x + lineBreak for x in blockLines[:-1]])
+        parts.append(indent + blockLines[-1] + lastBreak)
+        numBlocks += 1
+        i = end
+    parts.extend(lines[i:])
+    return "".join(parts), numBlocks
+
+def _iter_block_spans(lines, style):
+    """Generate the index of the first line, the index after the last, the indentation and
+    the CommentStyle of the same width of each comment block of a style in an iterable of
+    lines, reading each line once"""
+    opening = style.prefix + style.borderChar
+    prefix, suffix = style.prefix, style.suffix
+    start = None # Index of the border the block being read starts with
+    for i, line in enumerate(lines):
+        line = line.rstrip("\r\n")
+        if start is not None:
+            row = line[len(indent):]
+            # Lines of wide characters are as wide in columns, not characters
+            if line.startswith(indent) and (len(row) == width or text_width(row) == width):
+                if row == blockStyle.border:
+                    if i > start + 1:
+                        yield start, i + 1, indent, blockStyle
+                        start = None
+                        continue
+                    # Two borders alone are not taken to be a block, but the second may start one
+                elif row.startswith(prefix) and row.endswith(suffix):
+                    continue
+            start = None
+        row = line.lstrip(" \t")
+        if not row.startswith(opening) or not row.endswith(suffix):
+            continue
+        try:
+            blockStyle = get_style(style.name, len(row))
+        except ValueError: # Too narrow to be a block
+            continue
+        if row == blockStyle.border:
+            start, indent, width = i, line[:len(line) - len(row)], len(row)
+
+def _revert_block(rows, blockStyle):
+    """Return the plain text of the rows of a comment block, without their indentation, and
+    without the empty lines padding gives unless the block is marked"""
+    plainText = revert_to_plain("\n".join(rows), blockStyle)
+    if _find_marker(rows, blockStyle) is None: # Padding comes back as empty lines
+        plainText = plainText.strip("\n")
+    return plainText
+
+
+# --------------------- INDEX ---------------------
+# Comment blocks are indexed by where they are in their files, in lines and bytes, so that
+# their text is read back without the rest of the file, and files are scanned again only
+# when their size or time changes
+
+_indexVersion = 1 # Of the format of indexes, for older ones to be made again
+
+def scan_blocks(filePath, style, encoding="utf-8"):
+    """Return the first and last line, counting from 1, and the byte offset and length, of each
+    comment block of a style in a file, read once a line at a time
+    
+    The encoding must be one in which line breaks are single bytes, as in UTF-8.
+    """
+    lineStarts = array("L", [0]) # Byte offsets of the lines read, and of the next
+    
+    def iter_lines(bFile):
+        """Generate the lines of a binary file as text, recording where they start"""
+        for line in bFile:
+            lineStarts.append(lineStarts[-1] + len(line))
+            yield line.decode(encoding, "replace")
+    
+    with io.open(filePath, mode="rb") as bFile:
+        return [[start + 1, end, lineStarts[start], lineStarts[end] - lineStarts[start]] 
+                for start, end, indent, blockStyle in _iter_block_spans(iter_lines(bFile), style)]
+
+def update_index(index, filePaths, style, encoding="utf-8", numJobs=1):
+    """Return an index of the comment blocks of a style in files, and the number of files
+    scanned, taking the blocks of files of the same size and time from an earlier index
+    
+    An index is a dict, which may be written as JSON, of the files by path, each with its
+    size, time and a list of blocks as scan_blocks() returns them. Files not given are left
+    out, and files that cannot be read are given no blocks, to be scanned next time.
+    """
+    styleKey = [_indexVersion, style.name, encoding]
+    oldFiles = index.get("files", {}) if index.get("key") == styleKey else {}
+    files = {}
+    jobs = []
+    for filePath in filePaths:
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            continue
+        entry = oldFiles.get(filePath)
+        if entry is not None and entry[:2] == [stat.st_size, stat.st_mtime]:
+            files[filePath] = entry
+        else:
+            files[filePath] = [stat.st_size, stat.st_mtime, []]
+            jobs.append((filePath, style.name, encoding))
+    if numJobs > 1 and len(jobs) > 1:
+        results = _iter_pool_map(_scan_file_job, iter(jobs), numJobs)
+    else:
+        results = (_scan_file_job(job) for job in jobs)
+    for job, blocks in zip(jobs, results):
+        if blocks is None:
+            files[job[0]][1] = None # Never the same time
+        else:
+            files[job[0]][2] = blocks
+    return {"key": styleKey, "files": files}, len(jobs)
+
+def _scan_file_job(job):
+    """Return the blocks of a file as scan_blocks() does, or None if it cannot be read"""
+    filePath, styleName, encoding = job
+    try:
+        return scan_blocks(filePath, get_style(styleName), encoding)
+    except (IOError, OSError):
+        return None
+
+def iter_indexed_blocks(index, filePaths=None, errors=None):
+    """Generate the path, block and plain text of each comment block in an index, of the files
+    given or all of them, reading only the bytes of the blocks
+    
+    A file that cannot be read, or changed since indexed, raises IOError or
+    ValueError, unless errors is a list, to which its path and the error
+    are added instead, leaving the file out.
+    """
+    version, styleName, encoding = index["key"]
+    for filePath in filePaths if filePaths is not None else sorted(index["files"]):
+        blocks = index["files"][filePath][2]
+        if not blocks:
+            continue
+        try:
+            texts = _read_indexed_blocks(filePath, blocks, styleName, encoding)
+        except (IOError, OSError, ValueError) as e:
+            if errors is None:
+                raise
+            errors.append((filePath, e))
+            continue
+        for block, plainText in zip(blocks, texts):
+            yield filePath, block, plainText
+
+def _read_indexed_blocks(filePath, blocks, styleName, encoding):
+    """Return the plain text of each indexed block of a file, raising ValueError if the file
+    changed since indexed"""
+    texts = []
+    with io.open(filePath, mode="rb") as bFile:
+        for block in blocks:
+            bFile.seek(block[2])
+            # Split only at line breaks, as scan_blocks() counts lines, not at form feeds
+            rows = bFile.read(block[3]).decode(encoding, "replace").split("\n")
+            if rows[-1] == "":
+                rows.pop()
+            rows = [x.rstrip("\r") for x in rows]
+            row = rows[0].lstrip(" \t") if rows else ""
+            try:
+                blockStyle = get_style(styleName, len(row))
+            except ValueError:
+                blockStyle = None
+            if blockStyle is None or row != blockStyle.border or len(rows) != \
+                    block[1] - block[0] + 1:
+                raise ValueError("File changed since indexed: " + filePath)
+            indent = len(rows[0]) - len(row)
+            texts.append(_revert_block([x[indent:] for x in rows], blockStyle))
+    return texts
+
+def iter_export(blocks, exportFormat="text"):
+    """Generate the text of blocks, as iter_indexed_blocks() does with paths as they are to be
+    shown, in a format: text, with a heading line for each block, markdown or json"""
+    import json
+    if exportFormat == "json":
+        yield _textType("[")
+    for i, (path, block, plainText) in enumerate(blocks):
+        if exportFormat == "json":
+            yield _textType(("\n" if i == 0 else ",\n") + json.dumps({"file": path, "firstLine": block[0], 
+                    "lastLine": block[1], "offset": block[2], "length": block[3], 
+                    "text": plainText}, sort_keys=True))
+        elif exportFormat == "markdown":
+            yield "%s## %s, lines %d to %d\n\n%s\n" % ("\n" if i else "", path, block[0], 
+                                                        block[1], plainText)
+        else:
+            yield "%s==> %s:%d-%d <==\n%s\n" % ("\n" if i else "", path, block[0], block[1], 
+                                                plainText)
+    if exportFormat == "json":
+        yield _textType("\n]\n")
+
+
+# --------------------- PROFILING ---------------------
+# While profiling, the functions of each phase are swapped for timed ones, so that
+# nothing is timed or counted, and nothing costs more, the rest of the time
+
+class Profiler(object):
+    """Times and counts of the phases of converting and reverting text
+    
+    The time of a phase is its own, less that of the phases it calls, so the
+    times add up. Work done in worker processes is only seen as a wait.
+    """
+    
+    def __init__(self):
+        """Start with no phases timed"""
+        self.seconds = {} # Of each phase
+        self.calls = {}
+        self.items = {} # Generated, by the phases that are generators
+        self.counts = {} # Lines wrapped, titles centred, characters and bytes
+        self.started = _clock()
+        self._local = threading.local() # Phases running in each thread
+        self._lock = threading.Lock()
+    
+    def enter(self):
+        """Start timing a phase, called by the phase that is running, if any"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append([_clock(), 0.0]) # Start, and time taken by phases called
+    
+    def leave(self, phase, calls=0, items=0):
+        """Stop timing the phase last entered, adding its time to phase"""
+        stack = self._local.stack
+        start, inner = stack.pop()
+        seconds = _clock() - start
+        if stack:
+            stack[-1][1] += seconds
+        self.add(phase, seconds - inner, calls, items)
+    
+    def add(self, phase, seconds=0.0, calls=0, items=0):
+        """Add to the time, calls and items of a phase"""
+        with self._lock:
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + calls
+            self.items[phase] = self.items.get(phase, 0) + items
+    
+    def count(self, name, number=1):
+        """Add number to a count, such as of titles centred"""
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + number
+    
+    def report(self):
+        """Return a dict of the times and counts, as a JSON report has them"""
+        with self._lock:
+            phases = dict((x, {"seconds": self.seconds[x], "calls": self.calls[x], 
+                                "items": self.items[x]}) for x in self.seconds)
+            counts = dict(self.counts)
+        return {"seconds": _clock() - self.started, "phases": phases, "counts": counts, 
+                "caches": {"paragraph": wrap_cache_info()}}
+
+_clock = getattr(time, "perf_counter", time.time) # Python 2 has only time()
+_profiler = None # The Profiler while profiling
+_unprofiled = {} # Functions swapped for timed ones while profiling, by name
+
+def _count_text(profiler, args, result):
+    """Count the characters converted or reverted"""
+    if isinstance(args[0], _stringTypes):
+        profiler.count("charactersIn", len(args[0]))
+    profiler.count("charactersOut", len(result))
+
+def _count_file(profiler, args, result):
+    """Count the bytes of files converted or reverted"""
+    profiler.count("bytesIn", os.path.getsize(args[0]))
+    profiler.count("bytesOut", os.path.getsize(args[1]))
+
+def _count_layout(profiler, args, result):
+    """Count the lines wrapped to more than one row, and the titles centred"""
+    if result[1] is None:
+        profiler.count("titlesCentred")
+    elif len(result[1]) > 1:
+        profiler.count("linesWrapped")
+
+def _count_rows(profiler, args, result):
+    """Count the block lines rendered"""
+    profiler.count("rowsRendered", len(result))
+
+# Functions timed while profiling, with their phases, if they are generators, and counters
+_profilePhases = (
+    ("convert_to_comment", "convert", False, _count_text), 
+    ("iter_comment_lines", "block lines", True, None), 
+    ("_iter_text_lines", "split lines", True, None), 
+    ("_paragraph_lines", "paragraph cache", False, None), 
+    ("_layout", "expand tabs", False, _count_layout), 
+    ("_wrap_spans", "wrap", False, None), 
+    ("_fit_spans", "optimal fit", False, None), 
+    ("_iter_fit_words", "fit words", True, None), 
+    ("_render_rows", "render", False, _count_rows), 
+    ("make_paragraph", "exact paragraphs", False, None), 
+    ("revert_to_plain", "revert", False, _count_text), 
+    ("_revert_lines", "revert lines", False, None), 
+    ("_find_marker", "find marker", False, None), 
+    ("_parse_marker", "parse marker", False, None), 
+    ("_iter_exact_lines", "exact lines", True, None), 
+    ("iter_plain_lines", "join lines", True, None), 
+    ("_iter_classified_lines", "classify lines", True, None), 
+    ("_strip_commenting", "strip delimiters", False, None), 
+    ("convert_file", "convert file", False, _count_file), 
+    ("revert_file", "revert file", False, _count_file), 
+    ("_iter_file_progress", "read file", True, None), 
+    ("render_block", "render buffer", False, None), 
+    ("scan_blocks", "scan file", False, None), 
+    ("_iter_block_spans", "find blocks", True, None), 
+    ("_write_atomic", "write file", False, None))
+
+def enable_profiling():
+    """Start profiling with a new Profiler, which is returned"""
+    global _profiler
+    if _profiler is None:
+        moduleNames = globals()
+        for name, phase, isGenerator, counter in _profilePhases:
+            _unprofiled[name] = moduleNames[name]
+            moduleNames[name] = _profiled(moduleNames[name], phase, isGenerator, counter)
+    _profiler = Profiler()
+    return _profiler
+
+def disable_profiling():
+    """Stop profiling, returning the Profiler that was used, or None"""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    globals().update(_unprofiled)
+    _unprofiled.clear()
+    return profiler
+
+def _profiled(func, phase, isGenerator, counter):
+    """Return a version of func timed as phase, counting with counter(profiler, args, result)"""
+    if isGenerator:
+        def timed(*args, **kwargs):
+            profiler = _profiler
+            items = func(*args, **kwargs)
+            if profiler is None: # Stopped meanwhile
+                for item in items:
+                    yield item
+                return
+            numItems = 0
+            try:
+                while True:
+                    profiler.enter()
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        return
+                    finally:
+                        profiler.leave(phase)
+                    numItems += 1
+                    yield item
+            finally:
+                profiler.add(phase, calls=1, items=numItems)
+    else:
+        def timed(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return func(*args, **kwargs)
+            profiler.enter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profiler.leave(phase, 1)
+            if counter is not None:
+                counter(profiler, args, result)
+            return result
+    timed.__name__ = func.__name__
+    timed.__doc__ = func.__doc__
+    return timed
+
+def _timed(phase, func, *args):
+    """Return func(*args), timed as phase while profiling, such as for calls to Tk"""
+    profiler = _profiler
+    if profiler is None:
+        return func(*args)
+    profiler.enter()
+    try:
+        return func(*args)
+    finally:
+        profiler.leave(phase, 1)
+
+def format_profile(report):
+    """Return a profile report as a table of text, slowest phases first"""
+    phases = report["phases"]
+    lines = ["%-18s %10s %8s %10s %10s" % ("Phase", "Seconds", "%", "Calls", "Items")]
+    total = sum([x["seconds"] for x in phases.values()])
+    for phase in sorted(phases, key=lambda x: -phases[x]["seconds"]):
+        info = phases[phase]
+        lines.append("%-18s %10.4f %8.1f %10d %10s" % (phase, info["seconds"], 
+                        100.0 * info["seconds"] / max(total, 1e-9), info["calls"], 
+                        info["items"] or ""))
+    lines.append("%-18s %10.4f in %.4f seconds of profiling" % ("Total", total, report["seconds"]))
+    lines.append("")
+    for name in sorted(report["counts"]):
+        lines.append("%-18s %10d" % (name, report["counts"][name]))
+    for name in sorted(report["caches"]): # With that of the GUI's results in Diagnostics
+        info = report["caches"][name]
+        lines.append("%-18s %d hits, %d misses, %d items, size %d of %d" % (name + " cache", 
+                        info["hits"], info["misses"], info["items"], info["size"], info["maxSize"]))
+    return "\n".join(lines)
 
 
 # --------------------- GUI ---------------------
@@ -225,42 +2151,47 @@ def convert_to_comment(plainText, alignCenter, centerTitles, padCount, commentCh
 class TkGui(object):
     """Tkinter GUI constructor class"""
     # Instantiation of this class is not expected
-    def __init__(self, window):
-        """Initialize the GUI"""
+    def __init__(self, window, startTime=None, options=None, convertInput=False):
+        """Initialize the GUI, reporting the time taken since startTime once shown
+        
+        options, as from _block_options(), set the controls, and if convertInput,
+        text piped in is converted once all read.
+        """
+        load_tk() # Normally already done, to create the window
+        if startTime is None:
+            startTime = _clock()
+        # Font, ttk theme and platform, as found by the last launch if nothing changed since.
+        # Listing the fonts can be slow, so if the font directories changed, they are listed
+        # again once the window is shown
+        probeKey = _probe_key(window)
+        fontFingerprint = _font_fingerprint()
+        probe = _load_probe(probeKey)
+        probeCached = probe is not None
+        if not probeCached:
+            probe = _probe_environment(probeKey, fontFingerprint)
+        fontsChanged = probeCached and probe.get("fontFingerprint") != fontFingerprint
+        isMac = probe["mac"]
         # ttk styling theme per user operating system
         if gotTtk:
             themeStyle = ttk.Style()
-            if pl.system() == "Linux" and "clam" in themeStyle.theme_names():
-                themeStyle.theme_use("clam")
-            elif pl.system() == "Windows" and "winnative" in themeStyle.theme_names():
-                themeStyle.theme_use("winnative")
-            elif pl.system() == "Windows" and "vista" in themeStyle.theme_names():
-                themeStyle.theme_use("vista")
-            elif pl.system() == "Windows" and "xpnative" in themeStyle.theme_names():
-                themeStyle.theme_use("xpnative")
-            elif "aqua" in themeStyle.theme_names():
-                themeStyle.theme_use("aqua")
-            elif "alt" in themeStyle.theme_names():
-                themeStyle.theme_use("alt")
-            else:
+            try:
+                themeStyle.theme_use(probe["theme"])
+            except tk.TclError: # Gone since cached, until checked again
                 themeStyle.theme_use("default")
             if inConsole: print("Using ttk style theme:",themeStyle.theme_use())
         # Globally set items
         textSelectColor = "#99CCFF"
         #bgColor = "#D1D1CE" # No longer used, kept here for reference
-        availFonts = tkfont.families()
-        textFont = ""
-        for x in ("dejavu sans mono","monaco","console","consolas","monospace","sans mono",
-                    "liberation mono","courier","mono","helvetica","arial"):
-            try: # Take the first font that at least partly matches x
-                textFont = [y for y in availFonts if x in y.lower()][0]
-                break
-            except: # Fail silently, continue font search
-                pass
+        textFont = probe["font"]
         if inConsole: print("Using text font:",textFont)
         textFontSize = "10"
-        commentChar = "#" # Could be any -single- 1 in [#$;:/*\\]
-        numChars = 72
+        # Comment style and width of blocks, chosen in the Style menu
+        styleCtrl = tk.StringVar(value="#")
+        widthCtrl = tk.IntVar(value=72)
+        fileEncoding = "utf-8" # Of files loaded and written, rather than the platform default
+        # Whole results of converting and reverting, sized in characters, so that going back to
+        # earlier options or text shows the block at once
+        resultCache = _LRUCache(2**26, lambda key, text: len(text))
         
         # --------------------- CREATE WIDGETS ---------------------
         
@@ -280,9 +2211,26 @@ class TkGui(object):
         def copy_block():
             """Copies text from the Comment Block text box to the system clipboard"""
             # Clipboard may be lost once app quits (but comment block is written to Terminal)
-            commentBlock = commentText.get("1.0", "end")
+            commentBlock = block_text()
             winTop.clipboard_clear()
             winTop.clipboard_append(commentBlock)
+        
+        def save_block():
+            """Save the comment block to a file"""
+            filePath = fd.asksaveasfilename(title="Save Comment Block", defaultextension=".cbm", 
+                                            filetypes=[("Comment Block","*.cbm"), ("All","*")])
+            if filePath:
+                try:
+                    if blockStore["text"] is not None and blockStore["starts"] is None:
+                        blockStore["text"].save(filePath) # Written from its buffer, as it is
+                    else:
+                        _write_atomic(filePath, block_chunks(), fileEncoding)
+                    if inConsole: print("Saved file: "+filePath)
+                except Exception as e:
+                    window.option_add('*Dialog.msg.font', '-weight normal -size -12')
+                    msgText = "Error saving file " + filePath + "\n\n" + str(e)
+                    msg.showerror("Error", msgText, default=msg.OK)
+                    window.option_clear()
             
         def paste_plain():
             """Pastes text from the system clipboard into the Plain Text box"""
@@ -299,7 +2247,7 @@ class TkGui(object):
             filePath = fd.askopenfilename(filetypes=[("All","*"), ("Plain Text","*.txt")])
             if filePath:
                 try:        
-                    lFile = open(filePath, mode='r')
+                    lFile = io.open(filePath, mode='r', encoding=fileEncoding)
                     lText = lFile.read()
                     lFile.close()
                     inputText.delete("1.0", "end")
@@ -312,6 +2260,61 @@ class TkGui(object):
                     msg.showerror("Error", msgText, default=msg.OK)
                     window.option_clear()            
             
+        def file_to_file(action):
+            """Convert or revert a file to another without loading it into the text boxes"""
+            if workState["job"] is not None:
+                return
+            if action == "Converting":
+                inPath = fd.askopenfilename(title="Plain Text File to Convert", 
+                                            filetypes=[("All","*"), ("Plain Text","*.txt")])
+            else:
+                inPath = fd.askopenfilename(title="Comment Block File to Revert", 
+                                            filetypes=[("All","*"), ("Comment Block","*.cbm")])
+            if not inPath:
+                return
+            fileName = os.path.basename(inPath)
+            if action == "Converting":
+                fileName = fileName + ".cbm"
+            else:
+                fileName = fileName[:-4] if fileName.endswith(".cbm") else fileName + ".txt"
+            outPath = fd.asksaveasfilename(title="Save As", initialfile=fileName, 
+                                            initialdir=os.path.dirname(inPath))
+            if not outPath:
+                return
+            options = (radioAlignCtrl.get(), centerTitlesCtrl.get(), padLinesCtrl.get(), 
+                        exactCtrl.get(), current_style(), fitCtrl.get())
+            def work(job):
+                """Write the output file, returning the message to show"""
+                progress = lambda fraction: work_progress(job, fraction)
+                if action == "Converting":
+                    convert_file(inPath, outPath, options[0], options[1], options[2], options[4], 
+                                fileEncoding, progress, options[3], optimalFit=options[5])
+                else:
+                    revert_file(inPath, outPath, options[4], fileEncoding, progress)
+                return "Saved " + os.path.basename(outPath)
+            work_start(action, None, work)
+        
+        def convert_file_to_file():
+            """Convert a plain text file to a comment block file"""
+            file_to_file("Converting")
+        
+        def revert_file_to_file():
+            """Revert a comment block file to a plain text file"""
+            file_to_file("Reverting")
+            
+        def current_style():
+            """Return the CommentStyle chosen in the Style menu"""
+            return get_style(styleCtrl.get(), widthCtrl.get())
+        
+        def set_width():
+            """Ask for the width of comment blocks"""
+            width = sDialog.askinteger("Width", "Width of comment blocks in characters:", 
+                                        initialvalue=widthCtrl.get(), minvalue=12, maxvalue=400, 
+                                        parent=window)
+            if width:
+                widthCtrl.set(width)
+                live_schedule()
+            
         def help_about():
             """About info box"""
             window.option_add('*Dialog.msg.font', '-weight normal -size -12')
@@ -326,22 +2329,92 @@ class TkGui(object):
             """Instructions for use"""
             window.option_add('*Dialog.msg.font', '-weight normal -size -12')
             msgText = "\nConvert a text string to a 72 character wide comment block.\n\n"
+            msgText += "Choose the comment style and width of the block in the Style menu.\n\n"
             msgText += "Lines 66 characters long or shorter and starting with 5 hyphens or more\n"
             msgText += "can be centered as titles; check the 'Center -----Titles' button.\n\n"
+            msgText += "Check the 'Optimal Fit' button to wrap paragraphs for the least ragged "
+            msgText += "right edge, rather than filling each line in turn.\n\n"
             msgText += "Check the 'Padding Start/End' button to add an empty line at "
             msgText += "the beginning and end of the comment block.\n\n"
+            msgText += "Check the 'Live Preview' button to convert as you type.\n\n"
+            msgText += "Large texts are converted in the background, with progress shown "
+            msgText += "below the text boxes. Press 'Cancel' to stop.\n\n"
+            msgText += "Files too large for the text boxes can be converted with "
+            msgText += "'Convert File to File' in the File menu, using the options set here.\n\n"
+            msgText += "Comment blocks over a megabyte are shown read only, a part at a time. "
+            msgText += "Copy, save or revert them from the menus and buttons as usual.\n\n"
             msgText += "Reverting the comment block back to plain text may not reproduce "
             msgText += "the original text. Tabs are converted to spaces, some spaces may be "
-            msgText += "removed, and line breaks changed.\n"
+            msgText += "removed, and line breaks changed. Check the 'Mark for Exact Revert' "
+            msgText += "button to add a few marker lines to the end of the block, from which "
+            msgText += "the text is reverted exactly, unless the block was edited since.\n"
             msg.showinfo("Usage Instructions", msgText, default=msg.OK)
             window.option_clear()
         
+        def help_diagnostics():
+            """Window of the time taken by each phase of converting and reverting, while profiled"""
+            if diagState["window"] is not None:
+                diagState["window"].lift()
+                return
+            diagWindow = tk.Toplevel(window)
+            diagWindow.title("Diagnostics")
+            diagState["window"] = diagWindow
+            reportText = tk.Text(diagWindow, height=32, width=84, borderwidth=0, 
+                                font=commentText.cget("font"), padx=8, pady=8, wrap="none")
+            if gotTtk: buttonFrame = ttk.Frame(diagWindow)
+            else: buttonFrame = tk.Frame(diagWindow)
+            profileCtrl = tk.StringVar()
+            def show_report():
+                """Show the report of the profile, or how to start one"""
+                profiler = _profiler or diagState["profiler"]
+                if profiler is None:
+                    report = "Press 'Start Profiling', then convert and revert as usual.\n\n" + \
+                                "Nothing is timed while not profiling, and nothing is slower."
+                else:
+                    report = profiler.report()
+                    report["caches"]["result"] = resultCache.info()
+                    report = format_profile(report)
+                reportText.config(state="normal")
+                reportText.delete("1.0", "end")
+                reportText.insert("1.0", diagState["startup"] + "\n\n" + report)
+                reportText.config(state="disabled")
+                profileCtrl.set("Stop Profiling" if _profiler else "Start Profiling")
+            def toggle_profile():
+                """Start or stop profiling, keeping the profile to show once stopped"""
+                if _profiler is None:
+                    diagState["profiler"] = enable_profiling()
+                else:
+                    diagState["profiler"] = disable_profiling()
+                show_report()
+            def close_diagnostics():
+                """Close the window, which leaves profiling as it is"""
+                diagState["window"] = None
+                diagWindow.destroy()
+            for text, command in ((None, toggle_profile), ("Refresh", show_report), 
+                                    ("Close", close_diagnostics)):
+                if gotTtk: button = ttk.Button(buttonFrame, command=command)
+                else: button = tk.Button(buttonFrame, command=command)
+                if text is None: button.config(textvariable=profileCtrl)
+                else: button.config(text=text)
+                button.pack(side="left", padx=10, pady=10)
+            reportText.pack(side="top", fill="both", expand=True)
+            buttonFrame.pack(side="bottom")
+            diagWindow.wm_protocol("WM_DELETE_WINDOW", close_diagnostics)
+            show_report()
+        # Diagnostics window, the last profile, kept to show once stopped, and the startup time
+        diagState = {"window": None, "profiler": None, "startup": ""}
+        
         def quit_from_menu():
             """Print Comment box contents in Terminal and exit"""
-            if len(commentText.get("1.0", "end")) > 1:
+            commentBlock = block_text()
+            if len(commentBlock) > 1:
                 if inConsole: print("Comment block:")
-                print(commentText.get("1.0", "end"))
+                print(commentBlock)
                 if inConsole: print("Done.")
+            if inConsole: # Hit rates, for tuning the cache sizes
+                for name, info in (("Result", resultCache.info()), ("Paragraph", wrap_cache_info())):
+                    print("%s cache: %d hits, %d misses, %d items, size %d of %d" % (name, 
+                            info["hits"], info["misses"], info["items"], info["size"], info["maxSize"]))
             winTop.quit()
 
         # --------------------- Menu items
@@ -349,24 +2422,39 @@ class TkGui(object):
         # File menu
         fileMenu = tk.Menu(mainMenu, tearoff=0)
         mainMenu.add_cascade(label="File", menu=fileMenu)
-        if pl.mac_ver()[0] != '': # We're in Mac OS
+        if isMac: # We're in Mac OS
             fileMenu.add_command(label="Load Plain Text File...", command=load_file, 
                                     accelerator="Cmd - O")
+            fileMenu.add_command(label="Save Comment Block...", command=save_block)
+            fileMenu.add_command(label="Convert File to File...", command=convert_file_to_file)
+            fileMenu.add_command(label="Revert File to File...", command=revert_file_to_file)
             fileMenu.add_command(label="Quit", command=quit_from_menu, accelerator="Cmd - Q")
         else:
             fileMenu.add_command(label="Load Plain Text File...", command=load_file, 
                                     accelerator="Ctrl - O")
+            fileMenu.add_command(label="Save Comment Block...", command=save_block)
+            fileMenu.add_command(label="Convert File to File...", command=convert_file_to_file)
+            fileMenu.add_command(label="Revert File to File...", command=revert_file_to_file)
             fileMenu.add_command(label="Quit", command=quit_from_menu, accelerator="Ctrl - Q")
         # Edit menu
         editMenu = tk.Menu(mainMenu, tearoff=0)
         mainMenu.add_cascade(label="Edit", menu=editMenu)
         editMenu.add_command(label="Copy Comment Block", command=copy_block)
         editMenu.add_command(label="Paste Plain Text", command=paste_plain)
+        # Style menu, reconverting when live, by live_schedule() defined further down
+        styleMenu = tk.Menu(mainMenu, tearoff=0)
+        mainMenu.add_cascade(label="Style", menu=styleMenu)
+        for x in commentStyles:
+            styleMenu.add_radiobutton(label=commentStyles[x][3], value=x, variable=styleCtrl, 
+                                        command=lambda: live_schedule())
+        styleMenu.add_separator()
+        styleMenu.add_command(label="Width...", command=set_width)
         # Help menu
         helpMenu = tk.Menu(mainMenu, tearoff=0)
         mainMenu.add_cascade(label="Help", menu=helpMenu)
         helpMenu.add_command(label="About", command=help_about)
         helpMenu.add_command(label="Usage Instructions", command=help_instructions)
+        helpMenu.add_command(label="Diagnostics...", command=help_diagnostics)
         winTop.config(menu=mainMenu)
         
         # --------------------- Window frame of 3 rows
@@ -418,8 +2506,6 @@ class TkGui(object):
                         font=(textFont, textFontSize), selectbackground=textSelectColor, 
                         selectforeground="black", padx=4, pady=4, relief="flat", 
                         undo=True, wrap="word", highlightthickness=0, name="inputText")
-        # Without testing inConsole, script could freeze here
-        if not inConsole: inputText.insert("end", sys.stdin.read())
         # Scrollbar for text box
         if gotTtk: inputScroll=ttk.Scrollbar(inputTextFrame, name="inputScroll")
         else: inputScroll=tk.Scrollbar(inputTextFrame, name="inputScroll")
@@ -454,6 +2540,11 @@ class TkGui(object):
         if gotTtk: checkCenterTitles = ttk.Checkbutton(alignFrame, name="checkCenterTitles")
         else: checkCenterTitles = tk.Checkbutton(alignFrame, name="checkCenterTitles")
         checkCenterTitles.config(text="Center -----Titles", variable=centerTitlesCtrl)
+        # Option to wrap for the least ragged right edge
+        fitCtrl = tk.IntVar()
+        if gotTtk: checkFit = ttk.Checkbutton(alignFrame, name="checkFit")
+        else: checkFit = tk.Checkbutton(alignFrame, name="checkFit")
+        checkFit.config(text="Optimal Fit", variable=fitCtrl)
         
         # Option to pad with empty line at start and end of block
         padLinesCtrl = tk.IntVar()
@@ -461,6 +2552,40 @@ class TkGui(object):
         else: checkPadLines = tk.Checkbutton(frameMiddle, name="checkPadLines")
         checkPadLines.config(text="Padding Start/End", variable=padLinesCtrl)
         
+        # Option to reconvert as the plain text is edited
+        liveCtrl = tk.IntVar()
+        if gotTtk: checkLive = ttk.Checkbutton(frameMiddle, name="checkLive")
+        else: checkLive = tk.Checkbutton(frameMiddle, name="checkLive")
+        checkLive.config(text="Live Preview", variable=liveCtrl)
+        
+        # Option to mark the block so that reverting gives back the exact text
+        exactCtrl = tk.IntVar()
+        if gotTtk: checkExact = ttk.Checkbutton(frameMiddle, name="checkExact")
+        else: checkExact = tk.Checkbutton(frameMiddle, name="checkExact")
+        checkExact.config(text="Mark for Exact Revert", variable=exactCtrl)
+        
+        if options is not None: # Given on the command line
+            radioAlignCtrl.set(options["alignCenter"])
+            centerTitlesCtrl.set(options["centerTitles"])
+            padLinesCtrl.set(int(options["padCount"] > 0))
+            exactCtrl.set(int(options["exact"]))
+            fitCtrl.set(int(options["optimalFit"]))
+            styleCtrl.set(options["style"][0])
+            widthCtrl.set(options["style"][1])
+        
+        # --------------------- Progress of conversion, with a button to cancel it
+        workStatusCtrl = tk.StringVar()
+        if gotTtk:
+            workStatus = ttk.Label(frameLeftBottom, textvariable=workStatusCtrl)
+            workProgress = ttk.Progressbar(frameLeftBottom, orient="horizontal", 
+                                            mode="determinate", maximum=100)
+        else: # Only the percentage in the status label
+            workStatus = tk.Label(frameLeftBottom, textvariable=workStatusCtrl, anchor="w")
+            workProgress = None
+        if gotTtk: btnCancel = ttk.Button(frameRightBottom, name="btnCancel", text="Cancel")
+        else: btnCancel = tk.Button(frameRightBottom, name="btnCancel", text="Cancel")
+        btnCancel.config(state="disabled")
+        
         # Right vertical frame
         if gotTtk: frameRight= ttk.Frame(midRow, width=400, height=400)
         else: frameRight= tk.Frame(midRow, width=400, height=400)
@@ -484,8 +2609,7 @@ class TkGui(object):
         # Scrollbar for text box
         if gotTtk: commentScroll=ttk.Scrollbar(commentTextFrame, name="commentScroll")
         else: commentScroll=tk.Scrollbar(commentTextFrame, name="commentScroll")
-        commentScroll.config(orient="vertical", command=commentText.yview)
-        commentText.configure(yscrollcommand=commentScroll.set)
+        commentScroll.config(orient="vertical") # Scrolled by block_yview(), further down
         
         # --------------------- Bottom row contents
         # Quit button
@@ -500,27 +2624,338 @@ class TkGui(object):
         
         def convert_text():
             """Convert plain text input to comment block"""
-            inputString = inputText.get("1.0", "end")
-            if len(inputString) > 999999: # Let's stay sane
-                print("Text too long. Work with chunks shorter than 1,000,000 characters.")
+            options = (radioAlignCtrl.get(), centerTitlesCtrl.get(), padLinesCtrl.get(), 
+                        exactCtrl.get(), current_style(), fitCtrl.get())
+            # Without the line break Tk adds, for an exact revert to give back the text
+            inputString = _timed("tk get", inputText.get, "1.0", "end-1c" if options[3] else "end")
+            key = _convert_key(inputString, options[0], options[1], options[2], options[4], 
+                                options[3], options[5])
+            commentBlock = resultCache.get(key)
+            if commentBlock is not None: # Converted before with these options
+                show_output(commentText, commentBlock)
                 return
-            commentBlock = convert_to_comment(inputString, radioAlignCtrl.get(), 
-                                                centerTitlesCtrl.get(), padLinesCtrl.get(), 
-                                                commentChar, numChars)
-            commentText.delete("1.0", "end")
-            commentText.insert("1.0", commentBlock)
+            if (not options[3] and len(inputString) > largeBlockChars and 
+                    _fixedStrideRe.search(inputString) is None):
+                def work(job):
+                    """Render the block into one buffer, shown a window of lines at a time"""
+                    return render_block(inputString, options[0], options[1], options[2], 
+                                        options[4], options[5], 
+                                        lambda lines: work_lines(job, lines))
+                work_start("Converting", commentText, work)
+                return
+            # Lines keep their line breaks, as expected of an iterable by iter_comment_lines
+            inputLines = inputString.splitlines(True)
+            def work(job):
+                """Convert the lines, caching the block unless cancelled"""
+                commentBlock = convert_to_comment(work_lines(job, inputLines), options[0], 
+                                                    options[1], options[2], options[4], options[3], 
+                                                    optimalFit=options[5])
+                if not job["cancel"].is_set():
+                    resultCache.put(key, commentBlock)
+                return commentBlock
+            work_start("Converting", commentText, work)
         # Convert button binding
         btnConvert.config(command=convert_text)
 
         def revert_text():
             """Revert comment block to plain text"""
-            commentBlock = commentText.get("1.0", "end")
-            revertedString = revert_to_plain(commentBlock, commentChar)
-            inputText.delete("1.0", "end")
-            inputText.insert("1.0", revertedString)
+            commentBlock = block_text()
+            style = current_style()
+            key = _revert_key(commentBlock, style)
+            revertedString = resultCache.get(key)
+            if revertedString is not None:
+                show_output(inputText, revertedString)
+                return
+            blockLines = commentBlock.split("\n")
+            def work(job):
+                """Revert the lines, caching the text unless cancelled"""
+                revertedString = _revert_lines(blockLines, style, 
+                                                lambda lines: work_lines(job, lines))
+                if not job["cancel"].is_set():
+                    resultCache.put(key, revertedString)
+                return revertedString
+            work_start("Reverting", inputText, work)
         # Revert button binding
         btnRevert.config(command=revert_text)
 
+        # --------------------- Background work
+        # Converting runs in a thread so that the window stays responsive with large texts.
+        # The thread never touches widgets; the mainloop polls its progress and result
+        workState = {"job": None}
+        
+        def work_start(action, outputText, work):
+            """Run work(job) in a worker thread, to fill outputText with its result when done
+            
+            With outputText None, the result is a message for the status label.
+            """
+            job = {"action": action, "outputText": outputText, "fraction": 0.0, 
+                    "result": None, "error": None, "cancel": threading.Event()}
+            def run():
+                """Body of the worker thread"""
+                try:
+                    result = work(job)
+                except Exception as e:
+                    job["error"] = e
+                else:
+                    if not job["cancel"].is_set():
+                        job["result"] = result
+            job["thread"] = threading.Thread(target=run, name="CommentBlockWorker")
+            job["thread"].daemon = True # Quitting does not wait for it
+            workState["job"] = job
+            btnConvert.config(state="disabled")
+            btnRevert.config(state="disabled")
+            btnCancel.config(state="normal")
+            workStatusCtrl.set(action + "...")
+            job["thread"].start()
+            window.after(20, work_poll)
+        
+        def work_lines(job, lines):
+            """Generate lines for the work of job, counting them and stopping if cancelled"""
+            total = float(max(len(lines), 1))
+            for i, line in enumerate(lines):
+                if job["cancel"].is_set():
+                    return
+                job["fraction"] = i / total
+                yield line
+        
+        def work_progress(job, fraction):
+            """Take progress reported by a file function, which raising stops if cancelled"""
+            if job["cancel"].is_set():
+                raise RuntimeError("Cancelled")
+            job["fraction"] = fraction
+        
+        def work_poll():
+            """Show the progress of the worker thread, and its result once finished"""
+            job = workState["job"]
+            if job["thread"].is_alive():
+                percent = 100.0 * job["fraction"]
+                if workProgress is not None:
+                    workProgress.config(value=percent)
+                    if not job["cancel"].is_set():
+                        workStatusCtrl.set(job["action"] + "...")
+                elif not job["cancel"].is_set():
+                    workStatusCtrl.set("%s... %d%%" % (job["action"], percent))
+                window.after(50, work_poll)
+                return
+            workState["job"] = None
+            btnConvert.config(state="normal")
+            btnRevert.config(state="normal")
+            btnCancel.config(state="disabled")
+            if workProgress is not None:
+                workProgress.config(value=0)
+            if job["cancel"].is_set():
+                workStatusCtrl.set("Cancelled")
+            elif job["error"] is not None:
+                workStatusCtrl.set("")
+                window.option_add('*Dialog.msg.font', '-weight normal -size -12')
+                msgText = job["action"] + " failed\n\n" + str(job["error"])
+                msg.showerror("Error", msgText, default=msg.OK)
+                window.option_clear()
+            elif job["outputText"] is None:
+                workStatusCtrl.set(job["result"])
+                if inConsole: print(job["result"])
+            else:
+                workStatusCtrl.set("")
+                show_output(job["outputText"], job["result"])
+        
+        def show_output(outputText, text):
+            """Replace the contents of a text box with converted or reverted text"""
+            if outputText is commentText:
+                liveState["lines"] = None # Live preview must start over
+                if isinstance(text, BlockBuffer) or len(text) > largeBlockChars:
+                    show_large_block(text)
+                    return
+                if blockStore["text"] is not None: # Editable again, as it was
+                    blockStore["text"] = blockStore["starts"] = None
+                    commentText.config(state="normal", undo=True)
+                    frameRightTop.config(text=" Comment Block Output ")
+            _timed("tk delete", outputText.delete, "1.0", "end")
+            _timed("tk insert", outputText.insert, "1.0", text)
+        
+        def work_cancel():
+            """Stop the worker thread, leaving the text boxes as they were"""
+            job = workState["job"]
+            if job is not None:
+                job["cancel"].set() # Checked between lines, so the thread ends soon
+                btnCancel.config(state="disabled")
+                workStatusCtrl.set("Cancelling...")
+        # Cancel button binding
+        btnCancel.config(command=work_cancel)
+
+        # --------------------- Large comment blocks
+        # A large block is kept as one string, with the offsets of its lines, or as the
+        # BlockBuffer of a block of ASCII text, of which every line is at a known offset.
+        # The text box only holds the lines in view and a margin, read only and without
+        # undo, so neither Tk nor its undo stack keeps another copy. Scrolling moves the
+        # lines held
+        largeBlockChars = 2**20 # Blocks larger than this are shown a window of lines at a time
+        viewLines = 3000 # Lines held in the text box for a large block...
+        viewMargin = 1000 # ...which are moved once the view is this close to their ends
+        blockStore = {"text": None, "starts": None, "count": 0, "first": 0, "last": 0, 
+                        "move": None}
+        
+        def block_chunks():
+            """Return the comment block as strings, with the line break Tk ends text with"""
+            if blockStore["text"] is None:
+                return [_timed("tk get", commentText.get, "1.0", "end")]
+            if blockStore["starts"] is None: # BlockBuffer
+                return [blockStore["text"].text(), "\n"]
+            return [blockStore["text"], "\n"]
+        
+        def block_text():
+            """Return the comment block, whether held by the text box or only in view"""
+            return "".join(block_chunks())
+        
+        def show_large_block(text):
+            """Show a large comment block, string or BlockBuffer, a window of lines at a time"""
+            if isinstance(text, BlockBuffer):
+                starts = None
+                blockStore["count"] = len(text)
+            else:
+                starts = array("L", [0])
+                starts.extend([x.end() for x in re.finditer("\n", text)])
+                blockStore["count"] = len(starts)
+            blockStore["text"] = text
+            blockStore["starts"] = starts
+            commentText.config(state="normal", undo=False)
+            commentText.edit_reset() # Nor does undo keep what was shown before
+            frameRightTop.config(text=" Comment Block Output (read only) ")
+            show_block_lines(0)
+        
+        def show_block_lines(top):
+            """Fill the text box with the lines of a large block around line top, shown at the top"""
+            blockStore["move"] = None
+            text, starts = blockStore["text"], blockStore["starts"]
+            numLines = blockStore["count"]
+            top = max(0, min(top, numLines - 1))
+            first = max(0, top - viewMargin)
+            last = min(numLines, first + viewLines)
+            if starts is None: # Lines of a BlockBuffer are at fixed offsets
+                lines = text.text(first, last)
+            else:
+                lines = text[starts[first]:starts[last] - 1 if last < numLines else len(text)]
+            commentText.config(state="normal")
+            _timed("tk delete", commentText.delete, "1.0", "end")
+            _timed("tk insert", commentText.insert, "1.0", lines)
+            commentText.config(state="disabled")
+            commentText.edit_modified(False)
+            blockStore["first"], blockStore["last"] = first, last
+            commentText.yview("%d.0" % (top - first + 1))
+        
+        def block_scrolled(first, last):
+            """Set the scrollbar for the whole block, moving the lines held if near their ends"""
+            if blockStore["text"] is None:
+                commentScroll.set(first, last)
+                return
+            numLines = float(blockStore["count"])
+            held = blockStore["last"] - blockStore["first"]
+            top = blockStore["first"] + float(first) * held
+            bottom = blockStore["first"] + float(last) * held
+            commentScroll.set(top / numLines, bottom / numLines)
+            if blockStore["move"] is None and (
+                    (top < blockStore["first"] + viewMargin // 2 and blockStore["first"] > 0) or 
+                    (bottom > blockStore["last"] - viewMargin // 2 and 
+                        blockStore["last"] < numLines)):
+                # Not from within the scroll callback of the text box
+                blockStore["move"] = window.after_idle(show_block_lines, int(top))
+        
+        def block_yview(*args):
+            """Scroll the comment block from its scrollbar, over the whole of a large block"""
+            if blockStore["text"] is None or args[0] != "moveto":
+                commentText.yview(*args) # Lines held are moved once the view is near their ends
+                return
+            numLines = blockStore["count"]
+            top = int(float(args[1]) * numLines)
+            # Within the lines held, not too near an end unless it is that of the block
+            low = blockStore["first"] + viewMargin // 2 if blockStore["first"] > 0 else 0
+            high = blockStore["last"] - viewMargin if blockStore["last"] < numLines else numLines
+            if low <= top < high:
+                commentText.yview("%d.0" % (top - blockStore["first"] + 1))
+            else:
+                show_block_lines(top)
+        # Scrollbar and text box binding
+        commentScroll.config(command=block_yview)
+        commentText.configure(yscrollcommand=block_scrolled)
+        
+        # --------------------- Live preview
+        # Block lines are kept for each plain text line shown, to patch only what changed
+        liveState = {"lines": None, "rows": None, "options": None, "job": None}
+        
+        def live_update():
+            """Patch the comment block with the lines of paragraphs changed since last shown"""
+            liveState["job"] = None
+            if not liveCtrl.get():
+                return
+            if workState["job"] is not None: # Wait for the worker to finish with the block
+                liveState["job"] = window.after(300, live_update)
+                return
+            options = (radioAlignCtrl.get(), centerTitlesCtrl.get(), padLinesCtrl.get(), 
+                        exactCtrl.get(), current_style(), fitCtrl.get())
+            inputString = _timed("tk get", inputText.get, "1.0", "end-1c" if options[3] else "end")
+            lines = inputString.splitlines()
+            oldLines, oldRows = liveState["lines"], liveState["rows"]
+            if (oldLines is None or options != liveState["options"] or options[3] or 
+                    blockStore["text"] is not None or 
+                    window.getboolean(commentText.edit_modified())):
+                # Start over with the whole block, edited elsewhere or with other options,
+                # which is instant when toggling back to options seen before. A marked
+                # block always starts over, as its marker covers the whole text, as does
+                # a large one, of which the text box only holds the lines in view
+                key = _convert_key(inputString, options[0], options[1], options[2], options[4], 
+                                    options[3], options[5])
+                commentBlock = resultCache.get(key)
+                if commentBlock is None:
+                    commentBlock = convert_to_comment(inputString, options[0], options[1], 
+                                                        options[2], options[4], options[3], 
+                                                        optimalFit=options[5])
+                    resultCache.put(key, commentBlock)
+                show_output(commentText, commentBlock)
+                commentText.edit_modified(False)
+                liveState["lines"] = lines
+                liveState["rows"] = None # Not needed until the next edit
+                liveState["options"] = options
+                return
+            if oldRows is None:
+                oldRows = [_paragraph_lines(x, options[0], options[1], options[4], options[5]) 
+                            for x in oldLines]
+            # Paragraphs unchanged at the start and end are left alone
+            numSame = min(len(lines), len(oldLines))
+            start = 0
+            while start < numSame and lines[start] == oldLines[start]:
+                start += 1
+            end = 0
+            while end < numSame - start and lines[-1-end] == oldLines[-1-end]:
+                end += 1
+            newRows = [_paragraph_lines(x, options[0], options[1], options[4], options[5]) 
+                        for x in lines[start:len(lines)-end]]
+            # Text widget line of the first block line to replace, after border and padding
+            firstLine = 2 + options[2] + sum([len(x) for x in oldRows[:start]])
+            numOld = sum([len(x) for x in oldRows[start:len(oldRows)-end]])
+            if numOld:
+                _timed("tk delete", commentText.delete, "%d.0" % firstLine, 
+                        "%d.0" % (firstLine + numOld))
+            if newRows:
+                _timed("tk insert", commentText.insert, "%d.0" % firstLine, 
+                        "".join([y + "\n" for x in newRows for y in x]))
+            commentText.edit_modified(False)
+            liveState["lines"] = lines
+            liveState["rows"] = oldRows[:start] + newRows + oldRows[len(oldRows)-end:]
+            liveState["options"] = options
+        
+        def live_schedule(*args):
+            """Update the live preview once edits pause for a moment"""
+            if window.getboolean(inputText.edit_modified()):
+                inputText.edit_modified(False) # Or there will be no next <<Modified>> event
+            if liveCtrl.get():
+                if liveState["job"] is not None:
+                    window.after_cancel(liveState["job"])
+                liveState["job"] = window.after(300, live_update)
+        # Edits and option changes reconvert when live
+        inputText.bind("<<Modified>>", live_schedule)
+        for x in (radioAlignLeft, radioAlignCenter, checkCenterTitles, checkFit, checkPadLines, 
+                    checkExact, checkLive):
+            x.config(command=live_schedule)
+        
         # --------------------- Event handlers
         
         def mouse_wheel_scroll(event):
@@ -561,7 +2996,7 @@ class TkGui(object):
         # Obtain text on close of window
         window.wm_protocol("WM_DELETE_WINDOW", quit_from_menu) # No event passed
         # Quit accelerator binding
-        if pl.mac_ver()[0] != '':
+        if isMac:
             winTop.bind_all("<Command-q>", quit_app)
         else:
             winTop.bind_all("<Control-q>", quit_app)
@@ -570,11 +3005,109 @@ class TkGui(object):
             """Run the Load File command"""
             load_file()
         # Load File accelerator binding
-        if pl.mac_ver()[0] != '':
+        if isMac:
             winTop.bind_all("<Command-o>", open_app)
         else:
             winTop.bind_all("<Control-o>", open_app)
 
+        # --------------------- Startup
+        
+        def startup_done():
+            """Report the time taken to show the window, and check the probe soon after"""
+            seconds = _clock() - startTime
+            diagState["startup"] = "Started in %.3f seconds, with the font and theme %s" % (
+                                    seconds, "found" if not probeCached else 
+                                    "cached, fonts changed" if fontsChanged else "cached")
+            if inConsole: print(diagState["startup"])
+            window.after(1000, revalidate_probe, seconds)
+        window.after_idle(startup_done)
+        
+        def revalidate_probe(seconds):
+            """Probe the environment again if fonts changed since cached, using what changed"""
+            newProbe = probe
+            if fontsChanged: # Fonts were installed or removed since
+                newProbe = _probe_environment(probeKey, fontFingerprint)
+                if newProbe["font"] != probe["font"]:
+                    for x in (inputText, commentText):
+                        x.config(font=(newProbe["font"], textFontSize))
+                if gotTtk and newProbe["theme"] != probe["theme"]:
+                    themeStyle.theme_use(newProbe["theme"])
+            # Times of the last launches are kept with the probe, to track them
+            newProbe["startupSeconds"] = (probe.get("startupSeconds", []) + 
+                                            [round(seconds, 4)])[-20:]
+            _save_probe(newProbe)
+        
+        # --------------------- Piped input
+        # Text piped in, as by Geany, is read by a thread as it comes, and added to the text
+        # box by the mainloop, so the window is shown at once however slow or large the input
+        stdinChunkBytes = 2**16 # Read from standard input at a time
+        stdinTickChars = 2**20 # Added to the text box at most between other events
+        stdinState = {"chunks": None, "done": False, "error": None, "size": 0}
+        
+        def stdin_start():
+            """Start reading standard input in a thread, disabling conversion until done"""
+            from collections import deque
+            try:
+                stdinFd = sys.stdin.fileno()
+            except (AttributeError, ValueError, io.UnsupportedOperation): # None or closed
+                return
+            stdinState["chunks"] = deque() # Appended by the thread, taken by the mainloop
+            encoding = getattr(sys.stdin, "encoding", None) or "utf-8"
+            reader = threading.Thread(target=stdin_read, args=(stdinFd, encoding), 
+                                        name="CommentBlockStdin")
+            reader.daemon = True # Quitting does not wait for the input to end
+            btnConvert.config(state="disabled")
+            btnRevert.config(state="disabled")
+            workStatusCtrl.set("Reading input...")
+            reader.start()
+            window.after(20, stdin_poll)
+        
+        def stdin_read(stdinFd, encoding):
+            """Body of the reader thread, decoding standard input as it comes until it ends"""
+            import codecs
+            decoder = codecs.getincrementaldecoder(encoding)("replace")
+            decoder = io.IncrementalNewlineDecoder(decoder, True) # As read in text mode
+            try:
+                while True:
+                    data = os.read(stdinFd, stdinChunkBytes)
+                    text = decoder.decode(data, not data)
+                    if text:
+                        stdinState["chunks"].append(text)
+                    if not data:
+                        break
+            except (IOError, OSError) as e:
+                stdinState["error"] = e
+            stdinState["done"] = True
+        
+        def stdin_poll():
+            """Add the text read since the last poll to the input box, and once all is read,
+            allow conversion, converting at once if asked"""
+            chunks = stdinState["chunks"]
+            done = stdinState["done"] # Before taking the chunks, so none are left behind
+            parts = []
+            size = 0
+            while chunks and size < stdinTickChars:
+                parts.append(chunks.popleft())
+                size += len(parts[-1])
+            if parts:
+                _timed("tk insert", inputText.insert, "end", "".join(parts))
+                stdinState["size"] += size
+            if chunks or not done: # More to come, sooner if already read
+                workStatusCtrl.set("Reading input... %d KB" % (stdinState["size"] // 1024))
+                window.after(1 if chunks else 50, stdin_poll)
+                return
+            workStatusCtrl.set("")
+            if stdinState["error"] is not None and inConsole:
+                print("Error reading standard input: " + str(stdinState["error"]))
+            if workState["job"] is None:
+                btnConvert.config(state="normal")
+                btnRevert.config(state="normal")
+                if convertInput and stdinState["size"]:
+                    convert_text()
+        # Without testing inConsole, the thread would wait on the terminal
+        if not inConsole:
+            stdin_start()
+
         # --------------------- PLACE WIDGETS ---------------------
         
         # Window of 3 rows
@@ -603,11 +3136,14 @@ class TkGui(object):
         radioAlignLeft.grid(column=0, row=0, padx=10, pady=10, sticky="w")
         radioAlignCenter.grid(column=1, row=0, padx=10, sticky="w")
         checkCenterTitles.grid(column=0, columnspan=2, row=1, padx=10, sticky="w")
+        checkFit.grid(column=0, columnspan=2, row=2, padx=10, pady=(10, 0), sticky="w")
         
         checkPadLines.grid(column=0, row=1, padx=10, pady=10)
+        checkExact.grid(column=0, row=2, padx=10)
         
-        btnConvert.grid(column=0, row=2, pady=30)
-        btnRevert.grid(column=0, row=3)
+        btnConvert.grid(column=0, row=3, pady=30)
+        btnRevert.grid(column=0, row=4)
+        checkLive.grid(column=0, row=5, padx=10, pady=20)
         
         # Right column
         frameRight.grid(column=2, row=0, sticky="wens")
@@ -620,12 +3156,742 @@ class TkGui(object):
         
         # --------------------- Bottom row contents
         btnQuit.pack(side="bottom", padx=20, pady=10, ipadx=10)
+        
+        # --------------------- Left and right column bottom rows
+        # Aligned with the text boxes above
+        workStatus.pack(side="left", padx=(30, 10), pady=(0, 10))
+        if workProgress is not None:
+            workProgress.pack(side="left", fill="x", expand=True, padx=(0, 30), pady=(0, 10))
+        btnCancel.pack(side="right", padx=30, pady=(0, 10))
 
         if gotTtk:
             winGrip.place(relx=1.0, rely=1.0, anchor="se")
             winGrip.lift()
 
-if __name__ == "__main__":
+def run_gui(options=None, convertInput=False):
+    """Launch the GUI and run it until quit, with the controls set by options from
+    _block_options() if given, converting text piped in once read if convertInput"""
+    startTime = _clock()
+    load_tk()
     window = tk.Tk()
-    app = TkGui(window)
+    app = TkGui(window, startTime, options, convertInput)
     window.mainloop()
+
+# Fonts for the text boxes, in order of preference, each matching any font whose name has it
+_fontPreferences = ("dejavu sans mono", "monaco", "console", "consolas", "monospace", 
+                    "sans mono", "liberation mono", "courier", "mono", "helvetica", "arial")
+# ttk themes in order of preference, with the systems they are used on, or None for any
+_themePreferences = (("clam", ("Linux",)), ("winnative", ("Windows",)), ("vista", ("Windows",)), 
+                        ("xpnative", ("Windows",)), ("aqua", None), ("alt", None))
+
+def _probe_key(window):
+    """Return what the cached probe of the environment must have been made with to be used"""
+    preferences = repr((_fontPreferences, _themePreferences))
+    return "%s py%d tk%s ttk%d %08x" % (sys.platform, sys.version_info[0], 
+                                        window.call("info", "patchlevel"), gotTtk, 
+                                        zlib.crc32(preferences.encode("ascii")) & 0xffffffff)
+
+def _probe_environment(key, fontFingerprint):
+    """Return a dict of the font and ttk theme for the GUI, and facts of the platform"""
+    import platform
+    system = platform.system()
+    families = tkfont.families()
+    textFont = ""
+    lowerFamilies = [x.lower() for x in families]
+    for x in _fontPreferences: # Take the first font that at least partly matches x
+        matches = [y for y, lower in zip(families, lowerFamilies) if x in lower]
+        if matches:
+            textFont = matches[0]
+            break
+    theme = "default"
+    if gotTtk:
+        themeNames = ttk.Style().theme_names()
+        for x, systems in _themePreferences:
+            if x in themeNames and (systems is None or system in systems):
+                theme = x
+                break
+    return {"key": key, "fontFingerprint": fontFingerprint, "font": textFont, "theme": theme, 
+            "system": system, "mac": platform.mac_ver()[0] != ""}
+
+def _font_dirs():
+    """Return the directories fonts are installed in on this platform, and caches of them"""
+    home = os.path.expanduser("~")
+    if sys.platform.startswith("win"):
+        return [os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"), 
+                os.path.join(os.environ.get("LOCALAPPDATA", home), "Microsoft", "Windows", 
+                                "Fonts")]
+    if sys.platform == "darwin":
+        return ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    dataDir = os.environ.get("XDG_DATA_HOME") or os.path.join(home, ".local", "share")
+    cacheDir = os.environ.get("XDG_CACHE_HOME") or os.path.join(home, ".cache")
+    return ["/usr/share/fonts", "/usr/local/share/fonts", os.path.join(home, ".fonts"), 
+            os.path.join(dataDir, "fonts"), "/var/cache/fontconfig", # Rebuilt by fc-cache
+            os.path.join(cacheDir, "fontconfig")]
+
+def _font_fingerprint():
+    """Return a hash of when the font directories, and those two levels within, last changed
+    
+    A font installed or removed changes the time of the directory it is in,
+    as of /usr/share/fonts/truetype/dejavu, so the fonts, which are slow to
+    list from Tk when there are thousands, are only listed when this changes.
+    """
+    import hashlib
+    times = []
+    for fontDir in _font_dirs():
+        depth = fontDir.rstrip(os.sep).count(os.sep)
+        for dirPath, dirNames, fileNames in os.walk(fontDir):
+            if dirPath.count(os.sep) - depth >= 2:
+                dirNames[:] = []
+            try:
+                times.append("%s %r" % (dirPath, os.stat(dirPath).st_mtime))
+            except OSError: # Removed meanwhile
+                pass
+    return hashlib.sha1(_utf8("\n".join(times))).hexdigest()
+
+def _probe_path():
+    """Return the path of the cached probe, in the cache directory of the user"""
+    return os.path.join(_user_cache_dir(), "startup.json")
+
+def _user_cache_dir():
+    """Return the directory of files cached for the user, where the platform keeps them"""
+    if sys.platform.startswith("win"):
+        cacheDir = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        cacheDir = os.path.expanduser("~/Library/Caches")
+    else:
+        cacheDir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cacheDir, "CommentBlockMaker")
+
+def _load_probe(key):
+    """Return the cached probe of the environment if made with key, else None"""
+    import json
+    try:
+        with io.open(_probe_path(), mode="r", encoding="utf-8") as pFile:
+            probe = json.load(pFile)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(probe, dict) or probe.get("key") != key:
+        return None
+    return probe
+
+def _save_probe(probe):
+    """Cache the probe of the environment for the next launch, if the file can be written"""
+    import json
+    probePath = _probe_path()
+    try:
+        if not os.path.isdir(os.path.dirname(probePath)):
+            os.makedirs(os.path.dirname(probePath))
+        _write_atomic(probePath, [json.dumps(probe, indent=1, sort_keys=True)], "utf-8")
+    except (IOError, OSError): # Probed again next time
+        pass
+
+
+# --------------------- SERVER ---------------------
+# Editors can format a selection with a quick call to cbm_client.py, which asks
+# a long running server, instead of starting the GUI for each selection
+
+maxRequestWidth = 400 # Largest width a request may ask for, as in the GUI...
+maxRequestPad = 400 # ...and padding, so that no request holds up the others for long
+
+def default_socket_path():
+    """Return the path of the server socket of the current user, in a directory only they may use
+    
+    That is $XDG_RUNTIME_DIR, or else cbm-UID in the temporary directory,
+    made if not there. ValueError is raised if that is not a directory of
+    the user closed to others, who could otherwise stand in for the server.
+    """
+    runtimeDir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtimeDir and os.path.isdir(runtimeDir):
+        return os.path.join(runtimeDir, "cbm.sock")
+    import stat
+    dirPath = os.path.join(tempfile.gettempdir(), "cbm-%d" % os.getuid())
+    try:
+        os.mkdir(dirPath, 0o700)
+    except OSError: # There already, checked below
+        pass
+    info = os.lstat(dirPath)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise ValueError(dirPath + " is not a directory of this user closed to others")
+    return os.path.join(dirPath, "cbm.sock")
+
+def handle_request(request, defaults):
+    """Return the response to a server request, both dicts as decoded from JSON
+    
+    The action of a request is "convert" or "revert" of its "text", with
+    "options" to use instead of the defaults, or "options" to change the
+    defaults for later requests. "ping" and "shutdown" are answered too.
+    """
+    try:
+        action = request.get("action")
+        options = request.get("options") or {}
+        if not isinstance(options, dict):
+            raise ValueError("options must be an object")
+        if action == "options":
+            merged, parsed = _request_options(options, defaults)
+            defaults.update(merged)
+            return {"ok": True, "options": defaults, "styles": list(commentStyles)}
+        if action in ("convert", "revert"):
+            text = request.get("text")
+            if not isinstance(text, _stringTypes):
+                raise ValueError("text must be a string")
+            merged, (alignCenter, centerTitles, padCount, style, exact, optimalFit) = \
+                    _request_options(options, defaults)
+            if action == "convert":
+                text = convert_to_comment(text, alignCenter, centerTitles, padCount, style, exact, 
+                                            optimalFit=optimalFit)
+            else:
+                text = revert_to_plain(text, style)
+            return {"ok": True, "text": text}
+        if action in ("ping", "shutdown"):
+            return {"ok": True}
+        raise ValueError("Unknown action %r" % (action,))
+    except (ValueError, TypeError, OverflowError) as e: # Such as a pad of 1e999
+        return {"ok": False, "error": str(e)}
+
+def _request_options(options, defaults):
+    """Return the options of a request merged with the defaults, and as arguments of
+    convert_to_comment(), raising ValueError if any are not valid
+    """
+    merged = dict(defaults)
+    for name in options:
+        if name not in merged:
+            raise ValueError("Unknown option " + name)
+        merged[name] = options[name]
+    if merged["align"] not in ("left", "center"):
+        raise ValueError("align must be left or center")
+    padCount = int(merged["pad"])
+    if not 0 <= padCount <= maxRequestPad:
+        raise ValueError("pad must be from 0 to %d" % maxRequestPad)
+    width = int(merged["width"])
+    if width > maxRequestWidth:
+        raise ValueError("width must be at most %d" % maxRequestWidth)
+    style = get_style(merged["style"], width)
+    return merged, (int(merged["align"] == "center"), int(bool(merged["centerTitles"])), 
+                    padCount, style, bool(merged["exact"]), bool(merged["optimalFit"]))
+
+def serve(socketPath, defaults, idleTimeout=0):
+    """Answer requests on a Unix domain socket until shut down, or idle for idleTimeout seconds
+    
+    Each request is a line of JSON, answered with a line of JSON, as by
+    handle_request(). A connection may send any number of requests.
+    """
+    import socket, json, time, signal
+    try:
+        import socketserver
+    except ImportError: # Python 2
+        import SocketServer as socketserver
+    if not hasattr(socket, "AF_UNIX"):
+        raise SystemExit("Unix domain sockets are not available on this system")
+    if os.path.exists(socketPath):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socketPath)
+        except socket.error: # Left behind by a server that did not exit cleanly
+            os.remove(socketPath)
+        else:
+            raise SystemExit("A server is already running on " + socketPath)
+        finally:
+            probe.close()
+    lock = threading.Lock() # The caches are not thread safe, so requests take turns
+    state = {"lastRequest": time.time()}
+    
+    class Handler(socketserver.StreamRequestHandler):
+        """Answer each line read from a connection"""
+        def handle(self):
+            for line in iter(self.rfile.readline, b""):
+                try:
+                    request = json.loads(line.decode("utf-8"))
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be an object")
+                except ValueError as e:
+                    request, response = {}, {"ok": False, "error": "Bad request: " + str(e)}
+                else:
+                    with lock:
+                        state["lastRequest"] = time.time()
+                        response = handle_request(request, defaults)
+                self.wfile.write(json.dumps(response).encode("ascii") + b"\n")
+                if request.get("action") == "shutdown":
+                    server.shutdown()
+                    return
+    
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """Server answering each connection in a thread of its own"""
+        daemon_threads = True
+    
+    oldMask = os.umask(0o177) # Only the user may connect
+    try:
+        server = Server(socketPath, Handler)
+    finally:
+        os.umask(oldMask)
+    def watch_idle():
+        """Shut the server down once no request has come for idleTimeout seconds"""
+        idle = 0
+        while idle < idleTimeout:
+            time.sleep(idleTimeout - idle)
+            idle = time.time() - state["lastRequest"]
+        server.shutdown()
+    if idleTimeout:
+        watcher = threading.Thread(target=watch_idle, name="CommentBlockIdle")
+        watcher.daemon = True
+        watcher.start()
+    try: # Cleaning up as when interrupted
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    except ValueError: # Not called from the main thread
+        pass
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socketPath):
+            os.remove(socketPath)
+
+
+# --------------------- COMMAND LINE ---------------------
+
+def main(argv=None):
+    """Run from the command line, launching the GUI if no mode is given"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv: # Also the case when run as a custom command in Geany
+        run_gui()
+        return 0
+    import argparse
+    parser = argparse.ArgumentParser(prog="CommentBlockMaker.py", 
+                        description="Convert plain text to fixed width comment blocks and back. "
+                                    "Without arguments, the GUI is launched.")
+    modes = parser.add_mutually_exclusive_group(required=True)
+    modes.add_argument("--batch", choices=("convert", "revert"), 
+                        help="convert or revert all files given by PATH")
+    modes.add_argument("--filter", choices=("convert", "revert"), 
+                        help="convert or revert standard input, or the files given by PATH "
+                             "one after another, to standard output")
+    modes.add_argument("--reflow", action="store_true", 
+                        help="revert and convert again, in place, the comment blocks of the "
+                             "style in the files given by PATH, with the comment block options")
+    modes.add_argument("--extract", action="store_true", 
+                        help="write the plain text of the comment blocks of the style in the "
+                             "files given by PATH to standard output, from an index of them "
+                             "updated for the files changed since")
+    modes.add_argument("--gui", action="store_true", 
+                        help="launch the GUI, as without arguments, with the comment block "
+                             "options set")
+    modes.add_argument("--serve", action="store_true", 
+                        help="answer requests of cbm_client.py on a Unix domain socket, "
+                             "with the comment block options as defaults")
+    parser.add_argument("paths", nargs="*", metavar="PATH", 
+                        help="file, glob pattern or directory (searched recursively)")
+    parser.add_argument("-o", "--output-dir", metavar="DIR", 
+                        help="write output files here instead of alongside the input files")
+    parser.add_argument("--include", metavar="PATTERN", 
+                        help="file name pattern to take from directories "
+                             "(default *.txt to convert, *.cbm to revert, * to reflow or extract)")
+    parser.add_argument("--force", action="store_true", 
+                        help="with --batch revert, overwrite text files that exist, such as "
+                             "the text a block was made from")
+    parser.add_argument("--check", action="store_true", 
+                        help="with --reflow, list the files that would change without writing "
+                             "them, exiting with status 1 if there are any")
+    parser.add_argument("--no-cache", action="store_true", 
+                        help="with --reflow, read every file, rather than skipping those "
+                             "not changed since reflowed with the same options, and with "
+                             "--extract, scan every file without reading or writing an index")
+    parser.add_argument("--index", metavar="FILE", 
+                        help="index of --extract (default one for the PATHs given, in the "
+                             "cache directory of the user)")
+    parser.add_argument("--format", choices=("text", "markdown", "json"), default="text", 
+                        help="format of --extract (default text)")
+    parser.add_argument("--grep", metavar="PATTERN", 
+                        help="with --extract, only blocks whose text matches this regular "
+                             "expression")
+    parser.add_argument("-j", "--jobs", type=int, default=0, 
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--encoding", default="utf-8", help="text encoding of files (default utf-8)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print each file written")
+    parser.add_argument("--convert-input", action="store_true", 
+                        help="with --gui, convert the text piped in as soon as it is read")
+    parser.add_argument("--socket", metavar="PATH", 
+                        help="socket of --serve (default cbm.sock in $XDG_RUNTIME_DIR, or "
+                             "in a directory cbm-UID of the temporary directory)")
+    parser.add_argument("--idle-timeout", type=float, default=0, metavar="SECONDS", 
+                        help="stop --serve after this long without requests (default never)")
+    parser.add_argument("--profile", nargs="?", const="-", metavar="FILE", 
+                        help="write the time taken by each phase of the work, and counts of "
+                             "lines and characters, as JSON to FILE or standard error; work "
+                             "in other processes is not included, see --jobs")
+    _add_block_arguments(parser)
+    args = parser.parse_args(argv)
+    if (args.batch or args.reflow or args.extract) and not args.paths:
+        parser.error("no PATH given for --" + ("batch" if args.batch else "reflow" 
+                                                if args.reflow else "extract"))
+    if args.gui and args.pad > 1: # The GUI pads with one line or none
+        parser.error("--gui takes a --pad of at most 1, not %d" % args.pad)
+    if args.profile:
+        enable_profiling()
+    try:
+        if args.gui:
+            run_gui(_block_options(args), args.convert_input)
+            return 0
+        if args.serve:
+            return _run_server(args)
+        if args.filter:
+            return _run_filter(args)
+        if args.reflow:
+            return _run_reflow(args)
+        if args.extract:
+            return _run_extract(args)
+        return _run_batch(args)
+    finally:
+        if args.profile:
+            _write_profile(args.profile, disable_profiling().report())
+
+def _write_profile(filePath, report):
+    """Write a profile report as JSON to filePath, or to standard error if it is -"""
+    import json
+    output = json.dumps(report, indent=1, sort_keys=True)
+    if filePath == "-":
+        print(output, file=sys.stderr)
+    else:
+        with open(filePath, "w") as pFile:
+            pFile.write(output + "\n")
+
+def _add_block_arguments(parser):
+    """Add the options that mirror the GUI controls to an argument parser"""
+    parser.add_argument("-w", "--width", type=int, default=72, 
+                        help="width of the comment block in characters (default 72)")
+    parser.add_argument("-a", "--align", choices=("left", "center"), default="left", 
+                        help="alignment of comments (default left)")
+    parser.add_argument("-t", "--center-titles", action="store_true", 
+                        help="center lines starting with 5 or more hyphens as titles")
+    parser.add_argument("-p", "--pad", type=int, nargs="?", const=1, default=0, metavar="N", 
+                        help="add N empty lines at the start and end of the block (default 1, "
+                             "at most 1 with --gui)")
+    parser.add_argument("-s", "--style", "-c", "--comment-char", dest="style", default="#", 
+                        choices=list(commentStyles) + sorted(styleAliases), metavar="STYLE", 
+                        help="comment style, one of %s, or %s by name (default #; -c and "
+                             "--comment-char are older names)" % (" ".join(commentStyles), 
+                                                                   ", ".join(sorted(styleAliases))))
+    parser.add_argument("-x", "--exact", action="store_true", 
+                        help="end blocks with marker lines, so that they revert exactly")
+    parser.add_argument("-f", "--optimal-fit", action="store_true", 
+                        help="wrap paragraphs for the least ragged right edge, rather than "
+                             "filling each line in turn")
+
+def _block_options(args):
+    """Return the options for making comment blocks from parsed command line arguments"""
+    try:
+        style = get_style(args.style, args.width)
+    except ValueError:
+        raise SystemExit("Width must be at least 6 characters more than the delimiters")
+    if args.exact and style.innerWidth < 8:
+        raise SystemExit("Width must be at least 8 characters more than the delimiters "
+                            "for --exact")
+    # The style travels to worker processes by name and width
+    return {"alignCenter": int(args.align == "center"), "centerTitles": int(args.center_titles), 
+            "padCount": args.pad, "style": (style.name, style.width), "encoding": args.encoding, 
+            "exact": args.exact, "optimalFit": args.optimal_fit}
+
+def _run_filter(args):
+    """Convert or revert standard input or files to standard output, returning the exit status"""
+    import signal
+    options = _block_options(args)
+    style = get_style(*options["style"])
+    if hasattr(signal, "SIGPIPE"): # Stop quietly when the output is closed, as by head
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    sys.stdout.flush()
+    oFile = io.open(sys.stdout.fileno(), mode="w", encoding=options["encoding"], newline="", 
+                    closefd=False)
+    status = 0
+    for path in args.paths or ["-"]:
+        try:
+            if path == "-":
+                iFile = io.TextIOWrapper(io.BufferedReader(_FlushingReader(sys.stdin.fileno(), 
+                                                                            oFile)), 
+                                        encoding=options["encoding"])
+            else:
+                iFile = io.open(path, mode="r", encoding=options["encoding"])
+            with iFile:
+                if args.filter == "convert":
+                    convert_stream(iFile, oFile, options["alignCenter"], options["centerTitles"], 
+                                    options["padCount"], style, options["exact"], 
+                                    options["optimalFit"])
+                else:
+                    revert_stream(iFile, oFile, style)
+        except (IOError, OSError, UnicodeError) as e:
+            print("Error processing " + ("standard input" if path == "-" else path) + ": " + 
+                    str(e), file=sys.stderr)
+            status = 1
+    oFile.flush()
+    return status
+
+def _run_server(args):
+    """Serve requests with the options given on the command line as defaults"""
+    _block_options(args) # Checked here, rather than on the first request
+    defaults = {"align": args.align, "centerTitles": args.center_titles, "pad": args.pad, 
+                "style": args.style, "width": args.width, "exact": args.exact, 
+                "optimalFit": args.optimal_fit}
+    try:
+        _request_options({}, defaults)
+        socketPath = args.socket or default_socket_path()
+    except ValueError as e:
+        raise SystemExit(str(e))
+    serve(socketPath, defaults, args.idle_timeout)
+    return 0
+
+def _find_files(paths, include, skipHidden=False):
+    """Return (path, path relative to the PATH it was found by) of each file given by paths,
+    or None if a pattern matches no file
+    
+    Directories are searched for file names matching include, leaving out
+    those starting with a dot if skipHidden, such as of version control.
+    """
+    import glob, fnmatch
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirPath, dirNames, fileNames in os.walk(path):
+                if skipHidden:
+                    dirNames[:] = [x for x in dirNames if not x.startswith(".")]
+                dirNames.sort()
+                for fileName in sorted(fnmatch.filter(fileNames, include)):
+                    filePath = os.path.join(dirPath, fileName)
+                    files.append((filePath, os.path.relpath(filePath, path)))
+        elif os.path.isfile(path):
+            files.append((path, os.path.basename(path)))
+        else:
+            filePaths = sorted(glob.glob(path))
+            if not filePaths:
+                print("No files found for " + path, file=sys.stderr)
+                return None
+            for filePath in filePaths:
+                if os.path.isfile(filePath):
+                    files.append((filePath, os.path.basename(filePath)))
+    return files
+
+def _run_batch(args):
+    """Convert or revert files in worker processes, returning the exit status"""
+    options = _block_options(args)
+    include = args.include or ("*.txt" if args.batch == "convert" else "*.cbm")
+    jobs = _find_files(args.paths, include)
+    if jobs is None:
+        return 2
+    if args.batch == "convert": # Not the output of an earlier run
+        jobs = [x for x in jobs if not x[0].endswith(".cbm")]
+    for i, (filePath, relPath) in enumerate(jobs):
+        if args.batch == "convert":
+            relPath = relPath + ".cbm"
+        elif relPath.endswith(".cbm"):
+            relPath = relPath[:-4]
+        else:
+            relPath = relPath + ".txt"
+        if args.output_dir:
+            outPath = os.path.join(args.output_dir, relPath)
+        else:
+            outPath = os.path.join(os.path.dirname(filePath), os.path.basename(relPath))
+        jobs[i] = (filePath, outPath, args.batch, options)
+    failed = 0
+    # The .cbm files of converting are made again, but not text such as a block was made from,
+    # which a revert may not match
+    if args.batch == "revert" and not args.force:
+        newJobs = []
+        for job in jobs:
+            if os.path.exists(job[1]):
+                print("Not overwriting " + job[1] + " (see --force)", file=sys.stderr)
+                failed += 1
+            else:
+                newJobs.append(job)
+        jobs = newJobs
+    numJobs = args.jobs or _cpu_count()
+    if numJobs > 1 and len(jobs) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(min(numJobs, len(jobs)))
+        try:
+            chunkSize = max(1, len(jobs) // (numJobs*4))
+            errors = pool.imap(_convert_file_job, jobs, chunkSize)
+            failed += _report_batch(jobs, errors, args.verbose)
+        finally:
+            pool.close()
+            pool.join()
+    else: # A large file is split across the worker processes instead
+        options["jobs"] = numJobs
+        failed += _report_batch(jobs, (_convert_file_job(job) for job in jobs), args.verbose)
+    return 1 if failed else 0
+
+def _run_reflow(args):
+    """Reflow the comment blocks of files in place, in worker processes, returning the exit
+    status, which is 1 with --check if any file would change"""
+    options = _block_options(args)
+    files = _find_files(args.paths, args.include or "*", True)
+    if files is None:
+        return 2
+    # Files are skipped if their size and time, or else content, are as last reflowed with
+    # the same options, by this version of reflow_text()
+    optionsKey = "v%d %s %d a%d t%d p%d x%d f%d %s" % (_reflowVersion, options["style"][0], 
+                    options["style"][1], options["alignCenter"], options["centerTitles"], 
+                    options["padCount"], options["exact"], options["optimalFit"], 
+                    options["encoding"])
+    cachePath = os.path.join(_user_cache_dir(), "reflow.json")
+    cache = {} if args.no_cache else _load_json_cache(cachePath)
+    jobs = []
+    numSkipped = 0
+    for filePath, relPath in files:
+        filePath = os.path.abspath(filePath)
+        entry = cache.get(filePath)
+        if entry is None or entry[0] != optionsKey:
+            entry = None
+        else:
+            stat = os.stat(filePath)
+            if entry[1:3] == [stat.st_size, stat.st_mtime]:
+                numSkipped += 1
+                continue
+        jobs.append((filePath, options, args.check, entry[3] if entry else None))
+    numJobs = args.jobs or _cpu_count()
+    if numJobs > 1 and len(jobs) > 1:
+        results = _iter_pool_map(_reflow_file_job, iter(jobs), numJobs)
+    else:
+        results = (_reflow_file_job(job) for job in jobs)
+    failed = numChanged = 0
+    for job, (changed, digest, error) in zip(jobs, results):
+        filePath = job[0]
+        if error:
+            print(error, file=sys.stderr)
+            failed += 1
+            continue
+        if changed:
+            numChanged += 1
+            if args.check or args.verbose:
+                print(("Would reflow " if args.check else "") + filePath)
+        if digest is not None:
+            stat = os.stat(filePath)
+            cache[filePath] = [optionsKey, stat.st_size, stat.st_mtime, digest]
+    if args.verbose:
+        print("%d files %s, %d unchanged, %d skipped as cached" % (numChanged, 
+                "to reflow" if args.check else "reflowed", len(jobs) - numChanged - failed, 
+                numSkipped))
+    if not args.no_cache:
+        _save_json_cache(cachePath, cache)
+    return 1 if failed or (args.check and numChanged) else 0
+
+_reflowVersion = 1 # Of the way blocks are reflowed, for files reflowed before to be redone
+
+def _reflow_file_job(job):
+    """Reflow the comment blocks of a file in place, unless checking, returning if it
+    changed, the digest of its content once reflowed, if known, and an error message"""
+    import hashlib
+    filePath, options, check, cachedDigest = job
+    try:
+        with io.open(filePath, mode="rb") as bFile:
+            data = bFile.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == cachedDigest: # Only touched since
+            return False, digest, None
+        try:
+            text = data.decode(options["encoding"])
+        except UnicodeDecodeError: # Not text, left alone
+            return False, None, None
+        newText, numBlocks = reflow_text(text, options["alignCenter"], options["centerTitles"], 
+                                        options["padCount"], get_style(*options["style"]), 
+                                        options["exact"], options["optimalFit"])
+        if newText == text:
+            return False, digest, None
+        if check:
+            return True, None, None
+        _write_atomic(filePath, [newText], options["encoding"])
+        return True, hashlib.sha1(newText.encode(options["encoding"])).hexdigest(), None
+    except Exception as e:
+        return False, None, "Error processing file " + filePath + ": " + str(e)
+
+def _run_extract(args):
+    """Write the plain text of the comment blocks of files to standard output, updating the
+    index of them first, returning the exit status"""
+    import json, hashlib, signal
+    style = get_style(args.style)
+    try:
+        pattern = re.compile(args.grep, re.MULTILINE) if args.grep else None
+    except re.error as e:
+        raise SystemExit("Bad --grep pattern: " + str(e))
+    files = _find_files(args.paths, args.include or "*", True)
+    if files is None:
+        return 2
+    shownPaths = OrderedDict((os.path.abspath(x[0]), x[0]) for x in files)
+    indexPath = args.index
+    if indexPath is None: # One for each set of PATHs, which may be in other projects
+        roots = "\n".join(sorted(os.path.abspath(x) for x in args.paths))
+        indexPath = os.path.join(_user_cache_dir(), "index-%s.json" % 
+                                    hashlib.sha1(roots.encode("utf-8")).hexdigest()[:16])
+    index = {} if args.no_cache else _load_json_cache(indexPath)
+    index, numScanned = update_index(index, list(shownPaths), style, args.encoding, 
+                                        args.jobs or _cpu_count())
+    if not args.no_cache:
+        _save_json_cache(indexPath, index)
+    if hasattr(signal, "SIGPIPE"): # Stop quietly when the output is closed, as by head
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    sys.stdout.flush()
+    oFile = io.open(sys.stdout.fileno(), mode="w", encoding=args.encoding, newline="", 
+                    closefd=False)
+    errors = []
+    blocks = ((shownPaths[filePath], block, plainText) for filePath, block, plainText 
+                in iter_indexed_blocks(index, list(shownPaths), errors) 
+                if pattern is None or pattern.search(plainText))
+    status = 0
+    try:
+        for text in iter_export(blocks, args.format):
+            oFile.write(text)
+    except (IOError, OSError, ValueError) as e:
+        print("Error extracting blocks: " + str(e), file=sys.stderr)
+        status = 1
+    oFile.flush()
+    for filePath, error in errors: # Left out, and scanned again next time
+        print("Skipped %s: %s" % (shownPaths[filePath], error), file=sys.stderr)
+        index["files"][filePath][1] = None
+        status = 1
+    if errors and not args.no_cache:
+        _save_json_cache(indexPath, index)
+    if args.verbose:
+        print("%d files, %d scanned, %d blocks" % (len(shownPaths), numScanned, 
+                sum(len(x[2]) for x in index["files"].values())), file=sys.stderr)
+    return status
+
+def _load_json_cache(filePath):
+    """Return the dict in a JSON cache file, or an empty one if it cannot be read"""
+    import json
+    try:
+        with io.open(filePath, mode="r", encoding="utf-8") as cFile:
+            cache = json.load(cFile)
+    except (IOError, OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def _save_json_cache(filePath, cache):
+    """Write a dict to a JSON cache file, if it can be written"""
+    import json
+    cacheDir = os.path.dirname(os.path.abspath(filePath))
+    try:
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        _write_atomic(filePath, [json.dumps(cache)], "utf-8")
+    except (IOError, OSError):
+        pass
+
+def _report_batch(jobs, errors, verbose):
+    """Print the outcome of batch jobs as they finish, returning the number failed"""
+    failed = 0
+    for job, error in zip(jobs, errors):
+        if error:
+            print(error, file=sys.stderr)
+            failed += 1
+        elif verbose:
+            print(job[1])
+    return failed
+
+def _cpu_count():
+    """Return the number of CPUs, or 1 if unknown"""
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
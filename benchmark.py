@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+"""Benchmarks of the Comment Block Maker text engine
+
+Times convert_to_comment() with every combination of alignment, centred
+titles, padding, marking for an exact revert and optimal fit, and
+revert_to_plain() of each result, on synthetic texts of prose, short
+lines, -----titles and tab indented code, at sizes from 1K to 50M
+characters. The texts are made from a fixed seed, so runs are comparable.
+The time taken to import the script is also checked, as is that Tkinter
+is not imported with it. No display is needed.
+
+Results are written as JSON, and may be compared to those of an earlier
+run, saved as a baseline:
+
+    python benchmark.py -o baseline.json
+    python benchmark.py --baseline baseline.json --threshold 0.2
+
+The exit status is 1 if any case is slower than its baseline by more than
+the threshold, or if the import takes longer than its budget.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+from __future__ import print_function
+import sys, os, json, random, itertools, platform, subprocess, argparse
+from timeit import default_timer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import CommentBlockMaker as cbm
+
+_sizes = {"K": 2**10, "M": 2**20}
+_corpusNames = ("prose", "short", "titles", "tabs")
+
+
+# --------------------- CORPORA ---------------------
+
+def make_words(rand, count):
+    """Return a list of made up words of 1 to 4 syllables"""
+    syllables = [x + y for x in "bcdfghklmnprstvw" for y in ("a", "e", "i", "o", "u", "ai", "ou")]
+    return ["".join(rand.choice(syllables) for x in range(rand.randint(1, 4)))
+            for x in range(count)]
+
+def make_sentence(rand, words, numWords):
+    """Return a sentence of numWords, with some punctuation and hyphenated words"""
+    sentence = []
+    for i in range(numWords):
+        word = rand.choice(words)
+        if rand.random() < 0.03:
+            word = word + "-" + rand.choice(words)
+        if rand.random() < 0.08 and i < numWords - 1:
+            word = word + ","
+        sentence.append(word)
+    return " ".join(sentence).capitalize() + "."
+
+def iter_corpus_lines(name, rand, words):
+    """Generate the lines of a corpus without end"""
+    while True:
+        if name == "prose": # Long paragraphs, one per line, with empty lines between
+            yield " ".join(make_sentence(rand, words, rand.randint(4, 24))
+                            for x in range(rand.randint(1, 12)))
+            yield ""
+        elif name == "short": # Short lines that each make a row of their own
+            if rand.random() < 0.1:
+                yield ""
+            else:
+                yield make_sentence(rand, words, rand.randint(1, 8))
+        elif name == "titles": # Titles, some too long to center, under short paragraphs
+            yield "-"*rand.randint(5, 10) + make_sentence(rand, words, rand.randint(1, 14))[:-1]
+            for x in range(rand.randint(1, 3)):
+                yield make_sentence(rand, words, rand.randint(6, 30))
+            yield ""
+        elif name == "tabs": # Code indented with tabs, with tabs between too
+            depth = rand.randint(0, 4)
+            line = "\t"*depth + rand.choice(("def ", "if ", "for ", "return ", "")) + \
+                    "_".join(rand.choice(words) for x in range(rand.randint(1, 3)))
+            if rand.random() < 0.3:
+                line = line + "\t# " + make_sentence(rand, words, rand.randint(2, 12))
+            yield line
+        else:
+            raise ValueError("Unknown corpus " + name)
+
+def make_corpus(name, size, seed=0):
+    """Return a text of the named corpus, size characters long and ending with a line break"""
+    rand = random.Random("%s-%d" % (name, seed))
+    words = make_words(rand, 2000)
+    lines = []
+    length = 0
+    for line in iter_corpus_lines(name, rand, words):
+        if length + len(line) + 1 >= size:
+            lines.append(line[:max(size - length - 1, 0)])
+            break
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+def parse_size(text):
+    """Return the number of characters of a size such as 64K or 1M"""
+    text = text.strip().upper()
+    if text[-1:] in _sizes:
+        return int(float(text[:-1]) * _sizes[text[-1]])
+    return int(text)
+
+
+# --------------------- TIMING ---------------------
+
+def time_call(func, args, repeat):
+    """Return the result of func(*args) and the best time of repeat calls, with cold caches"""
+    best = None
+    for x in range(repeat):
+        cbm.clear_wrap_cache()
+        start = default_timer()
+        result = func(*args)
+        seconds = default_timer() - start
+        if best is None or seconds < best:
+            best = seconds
+    return result, best
+
+def time_import(repeat):
+    """Return the best time of importing the script in a new interpreter, and if Tk came with it"""
+    code = ("import sys, timeit; start = timeit.default_timer(); import CommentBlockMaker; "
+            "print(timeit.default_timer() - start); "
+            "print(int('tkinter' in sys.modules or 'Tkinter' in sys.modules))")
+    scriptDir = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    importsTk = False
+    for x in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=scriptDir)
+        seconds, tkFlag = output.decode("ascii").split()
+        best = min(best, float(seconds)) if best is not None else float(seconds)
+        importsTk = importsTk or tkFlag == "1"
+    return best, importsTk
+
+def run_cases(corpora, sizes, repeat, width, verbose):
+    """Time every case, returning a dict of the results by case name"""
+    cases = {}
+    for name in corpora:
+        for sizeName in sizes:
+            size = parse_size(sizeName)
+            text = make_corpus(name, size)
+            style = cbm.get_style("#", width)
+            for alignCenter, centerTitles, padCount, exact, optimalFit in \
+                    itertools.product((0, 1), repeat=5):
+                options = "a%dt%dp%dx%df%d" % (alignCenter, centerTitles, padCount, exact,
+                                                optimalFit)
+                block, convertTime = time_call(cbm.convert_to_comment,
+                                                (text, alignCenter, centerTitles, padCount, style,
+                                                exact, 1, optimalFit), repeat)
+                plain, revertTime = time_call(cbm.revert_to_plain, (block, style), repeat)
+                for action, seconds, inSize in (("convert", convertTime, len(text)),
+                                                ("revert", revertTime, len(block))):
+                    caseName = "-".join((name, sizeName, action, options))
+                    cases[caseName] = {"seconds": seconds, "characters": inSize,
+                                        "mbPerSecond": inSize / 1e6 / max(seconds, 1e-9)}
+                    if verbose:
+                        print("%-36s %10.4f s %8.1f MB/s" % (caseName, seconds,
+                                cases[caseName]["mbPerSecond"]), file=sys.stderr)
+    return cases
+
+
+# --------------------- BASELINE ---------------------
+
+def compare(results, baseline, threshold, minDelta):
+    """Return messages for the cases slower than in baseline by more than threshold"""
+    regressions = []
+    oldCases = baseline.get("cases", {})
+    for caseName in sorted(results["cases"]):
+        if caseName not in oldCases:
+            continue
+        old = oldCases[caseName]["seconds"]
+        new = results["cases"][caseName]["seconds"]
+        if new > old * (1 + threshold) and new - old > minDelta:
+            regressions.append("%s: %.4f s -> %.4f s (%+.0f%%)" %
+                                (caseName, old, new, 100.0 * (new - old) / max(old, 1e-9)))
+    return regressions
+
+
+# --------------------- COMMAND LINE ---------------------
+
+def main(argv=None):
+    """Run the benchmarks, returning the exit status"""
+    parser = argparse.ArgumentParser(description="Benchmark the Comment Block Maker text engine.")
+    parser.add_argument("--corpus", action="append", choices=_corpusNames,
+                        help="corpus to use, may be repeated (default all)")
+    parser.add_argument("--sizes", default="1K,64K,1M",
+                        help="comma separated sizes of texts (default 1K,64K,1M; "
+                             "the full range is 1K,64K,1M,10M,50M)")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="times to run each case, taking the best (default 3)")
+    parser.add_argument("-w", "--width", type=int, default=72, help="width of comment blocks")
+    parser.add_argument("-o", "--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fraction slower than the baseline counted as a regression "
+                             "(default 0.25)")
+    parser.add_argument("--min-delta", type=float, default=0.002,
+                        help="seconds slower than the baseline ignored as noise (default 0.002)")
+    parser.add_argument("--import-budget", type=float, default=100.0,
+                        help="milliseconds the import of the script may take (default 100)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print each case as timed")
+    args = parser.parse_args(argv)
+
+    importTime, importsTk = time_import(args.repeat)
+    results = {"python": platform.python_version(), "platform": platform.platform(),
+                "repeat": args.repeat, "width": args.width,
+                "importTime": importTime, "importsTk": importsTk,
+                "cases": run_cases(args.corpus or _corpusNames, args.sizes.split(","),
+                                    args.repeat, args.width, args.verbose)}
+    output = json.dumps(results, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as oFile:
+            oFile.write(output + "\n")
+    else:
+        print(output)
+
+    failures = []
+    if importsTk:
+        failures.append("Importing the script imports Tkinter")
+    if importTime * 1000 > args.import_budget:
+        failures.append("Import took %.1f ms, over the budget of %.1f ms" %
+                        (importTime * 1000, args.import_budget))
+    if args.baseline:
+        with open(args.baseline) as bFile:
+            baseline = json.load(bFile)
+        failures.extend(compare(results, baseline, args.threshold, args.min_delta))
+    for message in failures:
+        print(message, file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+"""Client of the Comment Block Maker server, for calling from editors
+
+Reads text from stdin, has the server convert or revert it, and writes the
+result to stdout. The server keeps running between calls, so formatting a
+selection takes no longer than starting this small script. If the server
+is not running, it is started, to exit after an hour without requests.
+
+As a custom command in Geany (Edit > Format > Send Selection to):
+
+    python /path/to/cbm_client.py convert -t -p
+
+Options not given are those the server was started with, which are the
+defaults of CommentBlockMaker.py unless it is started by hand with --serve.
+If anything fails, the text is written back unchanged and the exit status
+is 1, so that an editor replacing the selection with the output keeps it.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+from __future__ import print_function
+import sys, os, stat, json, socket, time, tempfile, subprocess, argparse
+
+serverScript = os.path.join(os.path.dirname(os.path.abspath(__file__)), "CommentBlockMaker.py")
+startTimeout = 5.0 # Seconds to wait for a server that was started to answer
+idleTimeout = 3600 # Seconds without requests after which a started server exits
+
+
+# --------------------- FUNCTIONS ---------------------
+
+def socket_path():
+    """Return the path of the server socket, as CommentBlockMaker.default_socket_path() does,
+    raising ValueError if its directory is not one of the user closed to others"""
+    runtimeDir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtimeDir and os.path.isdir(runtimeDir):
+        return os.path.join(runtimeDir, "cbm.sock")
+    dirPath = os.path.join(tempfile.gettempdir(), "cbm-%d" % os.getuid())
+    try:
+        os.mkdir(dirPath, 0o700)
+    except OSError: # There already, checked below
+        pass
+    info = os.lstat(dirPath)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise ValueError(dirPath + " is not a directory of this user closed to others")
+    return os.path.join(dirPath, "cbm.sock")
+
+def check_owner(path):
+    """Raise ValueError if the socket on path belongs to another user, who would get the text"""
+    try:
+        owner = os.stat(path).st_uid
+    except OSError: # Not there, so connecting fails
+        return
+    if owner != os.getuid():
+        raise ValueError("Socket " + path + " belongs to another user")
+
+def send_request(path, request):
+    """Send a request dict to the server on path, returning its response as a dict"""
+    check_owner(path)
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+        conn.sendall(json.dumps(request).encode("ascii") + b"\n")
+        chunks = []
+        while not chunks or not chunks[-1].endswith(b"\n"):
+            chunk = conn.recv(65536)
+            if not chunk:
+                raise socket.error("Server closed the connection")
+            chunks.append(chunk)
+    finally:
+        conn.close()
+    return json.loads(b"".join(chunks).decode("ascii"))
+
+def start_server(path):
+    """Start a server on path in the background, independent of this process"""
+    with open(os.devnull, "r+b") as devNull:
+        subprocess.Popen([sys.executable, serverScript, "--serve", "--socket", path,
+                            "--idle-timeout", str(idleTimeout)],
+                            stdin=devNull, stdout=devNull, stderr=devNull, close_fds=True,
+                            preexec_fn=os.setsid) # Not stopped with the editor's process group
+
+def request_or_start(path, request, autoStart):
+    """Send a request, starting the server first if it is not running"""
+    try:
+        return send_request(path, request)
+    except socket.error:
+        if not autoStart:
+            raise
+    start_server(path)
+    deadline = time.time() + startTimeout
+    while True:
+        time.sleep(0.05)
+        try:
+            return send_request(path, request)
+        except socket.error:
+            if time.time() > deadline:
+                raise
+
+
+# --------------------- COMMAND LINE ---------------------
+
+def main(argv=None):
+    """Run the client, returning the exit status"""
+    parser = argparse.ArgumentParser(description="Convert or revert stdin with the Comment "
+                                                "Block Maker server, writing to stdout.")
+    parser.add_argument("action", choices=("convert", "revert", "ping", "shutdown"))
+    parser.add_argument("-w", "--width", type=int, help="width of the comment block")
+    parser.add_argument("-a", "--align", choices=("left", "center"), help="alignment of comments")
+    parser.add_argument("-t", "--center-titles", action="store_true", default=None,
+                        help="center lines starting with 5 or more hyphens as titles")
+    parser.add_argument("-p", "--pad", type=int, nargs="?", const=1, metavar="N",
+                        help="add N empty lines at the start and end of the block")
+    parser.add_argument("-s", "--style", help="comment style, such as #, // or sql")
+    parser.add_argument("-x", "--exact", action="store_true", default=None,
+                        help="end blocks with marker lines, so that they revert exactly")
+    parser.add_argument("-f", "--optimal-fit", action="store_true", default=None,
+                        help="wrap paragraphs for the least ragged right edge")
+    parser.add_argument("--socket", metavar="PATH", help="socket of the server")
+    parser.add_argument("--no-start", action="store_true",
+                        help="fail rather than start a server if none is running")
+    args = parser.parse_args(argv)
+
+    options = {}
+    for name, value in (("width", args.width), ("align", args.align),
+                        ("centerTitles", args.center_titles), ("pad", args.pad),
+                        ("style", args.style), ("exact", args.exact),
+                        ("optimalFit", args.optimal_fit)):
+        if value is not None:
+            options[name] = value
+    data = b""
+    if args.action in ("convert", "revert"):
+        data = getattr(sys.stdin, "buffer", sys.stdin).read()
+    output = getattr(sys.stdout, "buffer", sys.stdout)
+    try:
+        response = request_or_start(args.socket or socket_path(),
+                                    {"action": args.action, "text": data.decode("utf-8"),
+                                    "options": options},
+                                    not args.no_start and args.action != "shutdown")
+        if not response.get("ok"):
+            raise ValueError(response.get("error"))
+    except (socket.error, ValueError) as e:
+        print("cbm_client: " + str(e), file=sys.stderr)
+        output.write(data) # Unchanged, so that the selection is not lost
+        return 1
+    text = response.get("text", "")
+    if args.action == "convert": # With a line break, as lines in the editor have
+        text = text + "\n"
+    output.write(text.encode("utf-8"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
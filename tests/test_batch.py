@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""Tests of converting and reverting files in batches, as with --batch
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, io, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CommentBlockMaker as cbm
+
+
+# --------------------- TESTS ---------------------
+
+class BatchTest(unittest.TestCase):
+    """Running main() with --batch"""
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.textPath = os.path.join(self.tempDir, "a.txt")
+        with io.open(self.textPath, "w", encoding="utf-8") as oFile:
+            oFile.write(u"Some text\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_convert_again(self):
+        """Converting again replaces the .cbm files, and does not convert them"""
+        for x in range(2):
+            self.assertEqual(cbm.main(["--batch", "convert", self.tempDir, "--include", "*",
+                                        "-j", "1"]), 0)
+            self.assertEqual(sorted(os.listdir(self.tempDir)), ["a.txt", "a.txt.cbm"])
+
+    def test_revert_keeps_text(self):
+        """Reverting does not overwrite the text a block was made from, unless forced"""
+        cbm.main(["--batch", "convert", self.tempDir, "-j", "1"])
+        with io.open(self.textPath, "w", encoding="utf-8") as oFile:
+            oFile.write(u"Edited\n")
+        self.assertEqual(cbm.main(["--batch", "revert", self.tempDir, "-j", "1"]), 1)
+        with io.open(self.textPath, encoding="utf-8") as iFile:
+            self.assertEqual(iFile.read(), u"Edited\n")
+        self.assertEqual(cbm.main(["--batch", "revert", self.tempDir, "-j", "1", "--force"]), 0)
+        with io.open(self.textPath, encoding="utf-8") as iFile:
+            self.assertEqual(iFile.read(), u"Some text\n")
+
+if __name__ == "__main__":
+    unittest.main()
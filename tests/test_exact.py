@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests that blocks marked for an exact revert give back the text they were made from
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, io, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CommentBlockMaker as cbm
+
+texts = (u"", u"\n", u"\n\n\n", u"One line", u"One line\n", u"First\n\n\nafter blank lines\n",
+        u"Trailing spaces   \n  leading and trailing  \n\t tabbed\t \n",
+        u"first line\ncbm: is my prefix", u"cbm: v1c5d0a0p1", u"cbm:\ncbm: two lines\n",
+        u"-----A title\ntext under it that is long enough to be wrapped over a few lines",
+        u"Wide 漢字 text and an emoji \U0001f600 in a line that wraps over lines\n",
+        u"漢字漢字漢字漢字漢字漢字漢字"
+        u"漢字漢字漢字漢字漢字漢字漢字")
+
+
+# --------------------- TESTS ---------------------
+
+class ExactRevertTest(unittest.TestCase):
+    """Converting with exact and reverting"""
+
+    def test_round_trip(self):
+        """Every text comes back as it was, with every option and style"""
+        for styleName in cbm.commentStyles:
+            for width in (40, 13): # Narrow enough for a marker line to hold 1 character
+                self.check_round_trip(cbm.get_style(styleName, width))
+
+    def check_round_trip(self, style):
+        """Check the texts with every option in a style"""
+        for text in texts:
+            for alignCenter in (0, 1):
+                for centerTitles in (0, 1):
+                    for padCount in (0, 1, 2):
+                        block = cbm.convert_to_comment(text, alignCenter, centerTitles, padCount,
+                                                        style, True)
+                        self.assertEqual(cbm.revert_to_plain(block, style), text,
+                                        (style.name, style.width, text, alignCenter,
+                                        centerTitles, padCount, block))
+
+    def test_text_like_marker_kept(self):
+        """Lines of text starting with cbm: are kept by a block that is not marked, and by a
+        marked block edited since"""
+        style = cbm.get_style("#", 40)
+        text = u"first line\ncbm: is my prefix"
+        block = cbm.convert_to_comment(text, 0, 0, 0, style)
+        self.assertIn(u"cbm: is my prefix", cbm.revert_to_plain(block, style))
+        block = cbm.convert_to_comment(text, 0, 0, 0, style, True).replace(u"first", u"1st")
+        plain = cbm.revert_to_plain(block, style)
+        self.assertIn(u"cbm: is my prefix", plain)
+        self.assertNotIn(u"v1c", plain)
+
+    def test_file_round_trip(self):
+        """Files come back as they were too, through revert_file()"""
+        tempDir = tempfile.mkdtemp()
+        try:
+            style = cbm.get_style("//", 50)
+            inPath, blockPath, outPath = [os.path.join(tempDir, x) for x in ("a", "b", "c")]
+            for text in texts:
+                with io.open(inPath, "w", encoding="utf-8", newline="") as oFile:
+                    oFile.write(text)
+                cbm.convert_file(inPath, blockPath, 1, 1, 1, style, exact=True)
+                cbm.revert_file(blockPath, outPath, style)
+                with io.open(outPath, encoding="utf-8", newline="") as iFile:
+                    self.assertEqual(iFile.read(), text)
+        finally:
+            shutil.rmtree(tempDir)
+
+if __name__ == "__main__":
+    unittest.main()
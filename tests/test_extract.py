@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests of indexing the comment blocks of files and reading them back, as with --extract
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, io, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CommentBlockMaker as cbm
+
+style = cbm.get_style("#", 30)
+texts = (u"Plain text long enough to wrap over a few lines",
+        u"漢字 wide text that wraps around \U0001f600 emoji here")
+
+
+# --------------------- TESTS ---------------------
+
+class ExtractTest(unittest.TestCase):
+    """Indexing with update_index() and reading with iter_indexed_blocks()"""
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def write(self, name, lines):
+        """Write lines to a file in the temporary directory, returning its path"""
+        filePath = os.path.join(self.tempDir, name)
+        with io.open(filePath, "w", encoding="utf-8", newline="") as oFile:
+            oFile.write(u"\n".join(lines) + u"\n")
+        return filePath
+
+    def test_blocks(self):
+        """Blocks are found and read back, with wide characters, form feeds and other
+        characters that are line breaks to splitlines() but not to files"""
+        rows = cbm.convert_to_comment(texts[0], 0, 0, 0, style).split(u"\n")
+        rows[1] = rows[1].replace(u"a", u"\x0c", 1).replace(u"n", u" ", 1)
+        rows[2] = rows[2].replace(u"o", u"\x1c", 1)
+        blocks = [cbm.convert_to_comment(x, 0, 0, 0, style) for x in texts] + [u"\n".join(rows)]
+        filePath = self.write("a.py", [u"x = 1"] + blocks + [u"y = 2"])
+        index, numScanned = cbm.update_index({}, [filePath], style)
+        self.assertEqual(numScanned, 1)
+        found = list(cbm.iter_indexed_blocks(index))
+        self.assertEqual([x[2] for x in found],
+                        [cbm.revert_to_plain(x, style).strip(u"\n") for x in blocks])
+        firstLines = [2]
+        for x in blocks:
+            firstLines.append(firstLines[-1] + x.count(u"\n") + 1)
+        self.assertEqual([x[1][:2] for x in found], [[firstLines[i], firstLines[i+1] - 1]
+                                                        for i in range(len(blocks))])
+
+    def test_bad_file(self):
+        """A file changed since indexed is left out, with an error, not ending the others"""
+        block = cbm.convert_to_comment(texts[1], 0, 0, 0, style)
+        filePaths = [self.write(x, [u"x = 1", block]) for x in ("a.py", "b.py", "c.py")]
+        index = cbm.update_index({}, filePaths, style)[0]
+        self.write("b.py", [u"x = 2", u"", block]) # As if the same size and time
+        self.assertRaises(ValueError, list, cbm.iter_indexed_blocks(index))
+        errors = []
+        found = list(cbm.iter_indexed_blocks(index, filePaths, errors))
+        self.assertEqual([x[0] for x in found], [filePaths[0], filePaths[2]])
+        self.assertEqual([x[0] for x in errors], [filePaths[1]])
+
+if __name__ == "__main__":
+    unittest.main()
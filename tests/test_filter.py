@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+"""Tests of converting and reverting streams, as with --filter
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, io, subprocess, unittest
+
+scriptDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, scriptDir)
+import CommentBlockMaker as cbm
+
+texts = (u"One line\n", u"intro\ncbm: a line of my text\nend\n",
+        u"First paragraph, long enough to be wrapped over a few lines of the block\n\nSecond\n",
+        u"-----A title\n\tTabbed\nlast line without a break")
+
+
+# --------------------- TESTS ---------------------
+
+def run_filter(action, data, options):
+    """Return the output of the script run with --filter action on data, as bytes"""
+    process = subprocess.Popen([sys.executable, os.path.join(scriptDir, "CommentBlockMaker.py"),
+                                "--filter", action] + options, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE)
+    output = process.communicate(data)[0]
+    if process.returncode:
+        raise AssertionError("--filter %s exited with %d" % (action, process.returncode))
+    return output
+
+class FilterTest(unittest.TestCase):
+    """Converting and reverting through convert_stream() and revert_stream()"""
+
+    def convert(self, text, style, exact=False):
+        """Return the block convert_stream() makes of text"""
+        oFile = io.StringIO()
+        cbm.convert_stream(io.StringIO(text), oFile, 0, 1, 1, style, exact)
+        return oFile.getvalue()
+
+    def revert(self, block, style):
+        """Return the text revert_stream() reverts block to"""
+        oFile = io.StringIO()
+        cbm.revert_stream(io.StringIO(block), oFile, style)
+        return oFile.getvalue()
+
+    def test_as_whole_text(self):
+        """Streams are converted and reverted as whole texts are"""
+        for styleName in cbm.commentStyles:
+            style = cbm.get_style(styleName, 30)
+            for text in texts:
+                block = self.convert(text, style)
+                self.assertEqual(block, cbm.convert_to_comment(text, 0, 1, 1, style) + u"\n")
+                self.assertEqual(self.revert(block, style), cbm.revert_to_plain(block, style))
+
+    def test_marker_left_out(self):
+        """The marker of an exact block is left out, but not text starting with cbm:"""
+        style = cbm.get_style("#", 30)
+        for text in texts:
+            exactBlock = self.convert(text, style, True)
+            self.assertEqual(self.revert(exactBlock, style),
+                            self.revert(self.convert(text, style), style))
+        self.assertIn(u"cbm: a line of my text", self.revert(self.convert(texts[1], style), style))
+
+    def test_pipeline(self):
+        """Text starting with cbm: comes through --filter convert and revert"""
+        for options in (["-w", "30"], ["-w", "30", "-x"]):
+            block = run_filter("convert", b"intro\ncbm: a line of my text\nend\n", options)
+            plain = run_filter("revert", block, ["-w", "30"])
+            self.assertIn(b"cbm: a line of my text", plain)
+            self.assertNotIn(b"v1c", plain)
+
+if __name__ == "__main__":
+    unittest.main()
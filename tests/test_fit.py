@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests of wrapping paragraphs for the least ragged right edge, as with optimalFit
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, random, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CommentBlockMaker as cbm
+
+wideWords = (u"漢字", u"Ｆｕｌｌ", u"\U0001f600", u"abc")
+
+
+# --------------------- TESTS ---------------------
+
+def least_cost(line, words, width, measure):
+    """Return the least sum of the squares of the columns left over on each line but the
+    last, over every way of breaking the (start, end) of words of line into lines that fit"""
+    best = [0] + [None]*len(words) # Least cost of the words before each, by the last line
+    for j in range(1, len(words) + 1):
+        for i in range(j):
+            used = measure(line[words[i][0]:words[j-1][1]])
+            if used <= width and best[i] is not None:
+                cost = best[i] + (0 if j == len(words) else (width - used)**2)
+                if best[j] is None or cost < best[j]:
+                    best[j] = cost
+    return best[-1]
+
+def spans_cost(line, spans, width, measure):
+    """Return the cost of the lines of spans, as least_cost() counts it"""
+    return sum((width - measure(line[i:j]))**2 for i, j in spans[:-1])
+
+class FitTest(unittest.TestCase):
+    """Wrapping with _fit_spans()"""
+
+    def check_fit(self, line, width, wide=False):
+        """Check the lines of line are whole words, fit, and cost no more than any others,
+        or are filled greedily if a word is too long for a line"""
+        measure = cbm.text_width if wide else len
+        spans = cbm._fit_spans(line, width, wide)
+        words = list(cbm._iter_fit_words(line))
+        if max(measure(line[i:j]) for i, j in words) > width:
+            self.assertEqual(spans, cbm._wrap_spans_textwrap(line, width, wide), line)
+            return
+        starts = set(x[0] for x in words)
+        ends = set(x[1] for x in words)
+        message = (line, width, spans)
+        self.assertEqual(spans[0][0], 0 if line[:words[0][0]].strip(" ") == u"" and
+                        measure(line[:words[0][1]]) <= width else words[0][0], message)
+        self.assertEqual(spans[-1][1], words[-1][1], message)
+        for n, (i, j) in enumerate(spans):
+            self.assertTrue(n == 0 or i in starts, message)
+            self.assertIn(j, ends, message)
+            self.assertTrue(measure(line[i:j]) <= width, message)
+        self.assertEqual(spans_cost(line, spans, width, measure),
+                        least_cost(line, words, width, measure), message)
+
+    def test_least_cost(self):
+        """Random paragraphs are wrapped at the least cost of every way of breaking them"""
+        rand = random.Random(7)
+        for x in range(400):
+            width = rand.randint(4, 16)
+            words = [u"x"*rand.randint(1, width) for y in range(rand.randint(1, 11))]
+            if rand.random() < 0.3: # Hyphens, which lines can be broken after
+                words[0] = words[0][:1] + u"-" + words[0][1:]
+            line = u"".join(x + u" "*rand.choice((1, 1, 1, 2)) for x in words).rstrip(u" ")
+            self.check_fit(line, width)
+
+    def test_least_cost_wide(self):
+        """Wide characters are measured in columns"""
+        rand = random.Random(11)
+        for x in range(200):
+            line = u" ".join(rand.choice(wideWords) for y in range(rand.randint(1, 9)))
+            self.check_fit(line, rand.randint(4, 12), True)
+
+    def test_known(self):
+        """A paragraph greedy filling leaves ragged is evened out"""
+        line = u"aaa bb cc ddddd"
+        self.assertEqual(cbm._wrap_spans(line, 6), [(0, 6), (7, 9), (10, 15)])
+        self.assertEqual(cbm._fit_spans(line, 6), [(0, 3), (4, 9), (10, 15)])
+
+    def test_long_word(self):
+        """A word longer than a line is wrapped greedily, as textwrap does"""
+        for line in (u"ab averyverylongword cd", u"averyverylongword", u"a bc-defghijklmnop q",
+                    u"  indented averyverylongword"):
+            for width in (4, 5, 8):
+                self.assertEqual(cbm._fit_spans(line, width),
+                                cbm._wrap_spans_textwrap(line, width))
+        line = u"ab 漢字漢字漢字 cd"
+        self.assertEqual(cbm._fit_spans(line, 5, True),
+                        cbm._wrap_spans_textwrap(line, 5, True))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+"""Tests of the command line options of --gui that are checked before the window is made
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, subprocess, unittest
+
+scriptDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# --------------------- TESTS ---------------------
+
+class GuiOptionsTest(unittest.TestCase):
+    """Running the script with --gui and options it can not show"""
+
+    def test_pad(self):
+        """A --pad of more than 1, which the padding checkbox can not show, is refused"""
+        process = subprocess.Popen([sys.executable, os.path.join(scriptDir, "CommentBlockMaker.py"),
+                                    "--gui", "-p", "2"], stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        errors = process.communicate(b"")[1].decode("utf-8", "replace")
+        self.assertEqual(process.returncode, 2)
+        self.assertIn("--pad of at most 1", errors)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""Tests that the text engine imports quickly, without Tkinter and without I/O
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, subprocess, unittest
+
+scriptDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+importBudget = 0.1 # Seconds the import of the script may take, as in benchmark.py
+importCode = ("import sys, timeit; start = timeit.default_timer(); import CommentBlockMaker; "
+                "print(timeit.default_timer() - start); "
+                "print(int('tkinter' in sys.modules or 'Tkinter' in sys.modules))")
+
+
+# --------------------- TESTS ---------------------
+
+class ImportTest(unittest.TestCase):
+    """Importing CommentBlockMaker in a new interpreter"""
+
+    def run_import(self):
+        """Return the seconds the import took, whether Tk came with it, and anything it printed"""
+        env = dict(os.environ)
+        env.pop("PYTHONDONTWRITEBYTECODE", None) # Timed as an installed script is, compiled
+        process = subprocess.Popen([sys.executable, "-c", importCode], cwd=scriptDir, env=env,
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE)
+        output, errors = process.communicate(b"")
+        self.assertEqual(process.returncode, 0, errors.decode("utf-8", "replace"))
+        lines = output.decode("utf-8", "replace").splitlines()
+        return float(lines[-2]), lines[-1] == "1", lines[:-2]
+
+    def test_no_tkinter(self):
+        """Tkinter is not imported, and nothing is printed or read from stdin"""
+        seconds, importsTk, extra = self.run_import()
+        self.assertFalse(importsTk)
+        self.assertEqual(extra, [])
+
+    def test_import_budget(self):
+        """The best of a few imports, after the first compiles the script, is within budget"""
+        self.run_import()
+        best = min(self.run_import()[0] for x in range(3))
+        self.assertLess(best, importBudget, "Import took %.1f ms, over the budget of %.1f ms" %
+                        (best * 1000, importBudget * 1000))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+"""Tests that a large text converted in chunks by worker processes gives the same block
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, itertools, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CommentBlockMaker as cbm
+
+text = (u"-----A title\n"
+        u"First paragraph, long enough to be wrapped over a few lines of the block\n\n"
+        u"\tTabbed line with    runs of spaces\n"
+        u"averyveryverylongwordthatislongerthanthewholeblock and more words after it\n") * 5
+# Every combination of options for these, one for the rest, as each pool takes a while
+matrixStyles = ("#", "//", "/*")
+
+
+# --------------------- TESTS ---------------------
+
+class ParallelTest(unittest.TestCase):
+    """Converting with _iter_parallel_block() and convert_to_comment() with jobs"""
+
+    def setUp(self):
+        # Small enough for the text to be several chunks, and to be converted in parallel
+        self.saved = cbm._chunkChars, cbm._parallelThreshold
+        cbm._chunkChars, cbm._parallelThreshold = 100, 100
+
+    def tearDown(self):
+        cbm._chunkChars, cbm._parallelThreshold = self.saved
+
+    def check_same(self, style, alignCenter, centerTitles, padCount, optimalFit):
+        """Check the block made in chunks is the block iter_comment_lines() makes"""
+        serial = u"\n".join(cbm.iter_comment_lines(text, alignCenter, centerTitles, padCount,
+                                                    style, optimalFit=optimalFit))
+        parallel = u"\n".join(cbm._iter_parallel_block(text.splitlines(), alignCenter,
+                                                        centerTitles, padCount, style, 2,
+                                                        optimalFit))
+        self.assertEqual(parallel, serial, (style.name, alignCenter, centerTitles, padCount,
+                                            optimalFit))
+
+    def test_options(self):
+        """Every alignment, title, padding and fit gives the same block"""
+        for styleName in matrixStyles:
+            style = cbm.get_style(styleName, 30)
+            for options in itertools.product((0, 1), (0, 1), (0, 1, 2), (False, True)):
+                self.check_same(style, *options)
+
+    def test_styles(self):
+        """Every style gives the same block"""
+        for styleName in cbm.commentStyles:
+            self.check_same(cbm.get_style(styleName, 40), 0, 1, 1, False)
+
+    def test_convert_to_comment(self):
+        """convert_to_comment() with jobs gives the same block, and stays serial when exact"""
+        style = cbm.get_style("#", 30)
+        for optimalFit in (False, True):
+            self.assertEqual(cbm.convert_to_comment(text, 1, 1, 2, style, jobs=2,
+                                                    optimalFit=optimalFit),
+                            cbm.convert_to_comment(text, 1, 1, 2, style, optimalFit=optimalFit))
+        self.assertEqual(cbm.convert_to_comment(text, 0, 1, 1, style, True, jobs=2),
+                        cbm.convert_to_comment(text, 0, 1, 1, style, True))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests of reflowing the comment blocks in source files, as with --reflow
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CommentBlockMaker as cbm
+
+texts = (u"Plain text that is long enough to wrap over two or three lines of a block",
+        u"漢字 wide text that wraps around \U0001f600 emoji here",
+        u"Ｆｕｌｌｗｉｄｔｈ ｌｅｔｔｅｒｓ")
+
+
+# --------------------- TESTS ---------------------
+
+def make_source(blocks, indent=u"    "):
+    """Return the text of a source file with the blocks in it, indented"""
+    lines = [u"x = 1"]
+    for block in blocks:
+        lines.extend([indent + x for x in block.split(u"\n")])
+        lines.append(u"y = 2")
+    return u"\n".join(lines) + u"\n"
+
+class ReflowTest(unittest.TestCase):
+    """Reflowing with reflow_text()"""
+
+    def test_reflow(self):
+        """Blocks are found and made again with the new options, wide characters or not"""
+        for text in texts:
+            oldStyle = cbm.get_style("#", 30)
+            oldBlock = cbm.convert_to_comment(text, 0, 0, 0, oldStyle)
+            # As reverting does, without the padding
+            plainText = cbm.revert_to_plain(oldBlock, oldStyle).strip(u"\n")
+            newBlock = cbm.convert_to_comment(plainText, 1, 0, 1, cbm.get_style("#", 40))
+            for indent in (u"", u"    ", u"\t"):
+                newText, count = cbm.reflow_text(make_source([oldBlock, oldBlock], indent),
+                                                    1, 0, 1, cbm.get_style("#", 40))
+                self.assertEqual(count, 2, text)
+                self.assertEqual(newText, make_source([newBlock, newBlock], indent))
+
+    def test_unchanged(self):
+        """Blocks made with the same options come back the same"""
+        style = cbm.get_style("//", 40)
+        source = make_source([cbm.convert_to_comment(x, 0, 1, 0, style) for x in texts])
+        self.assertEqual(cbm.reflow_text(source, 0, 1, 0, style), (source, len(texts)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""Tests that comment blocks rendered into a fixed-stride buffer are those of convert_to_comment()
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, itertools, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CommentBlockMaker as cbm
+
+texts = (u"", u"One line", u"One line\n", u"\n\n",
+        u"-----A title\ntext under it that is long enough to be wrapped over a few lines",
+        u"First paragraph, long enough to be wrapped over a few lines of the block\n\n"
+        u"Second paragraph\n",
+        u"\tTabbed line of text that goes on for long enough to wrap, with    runs of spaces",
+        u"-----A title much too long to fit on one line of the block, so wrapped instead",
+        u"averyveryverylongwordthatislongerthanthewholeblock and more words after it")
+
+
+# --------------------- TESTS ---------------------
+
+class RenderTest(unittest.TestCase):
+    """Rendering with render_block()"""
+
+    def test_as_convert(self):
+        """Every text, style, alignment, title, padding and fit gives the block of
+        convert_to_comment(), line for line"""
+        for styleName in cbm.commentStyles:
+            for width in (30, 72):
+                style = cbm.get_style(styleName, width)
+                for text, alignCenter, centerTitles, padCount, optimalFit in itertools.product(
+                        texts, (0, 1), (0, 1), (0, 1, 2), (False, True)):
+                    options = (alignCenter, centerTitles, padCount, style)
+                    block = cbm.convert_to_comment(text, *options, optimalFit=optimalFit)
+                    buffer = cbm.render_block(text, *options, optimalFit=optimalFit)
+                    self.assertEqual(buffer.text(), block, (style.name, width, text, options,
+                                                            optimalFit))
+                    lines = block.split(u"\n")
+                    self.assertEqual(len(buffer), len(lines))
+                    self.assertEqual(buffer.view().tobytes(), (block + u"\n").encode("ascii"))
+                    self.assertEqual(buffer.line(len(lines) - 2).tobytes(),
+                                    lines[-2].encode("ascii"))
+
+    def test_lines(self):
+        """Ranges of lines are those of the block, and lines out of it are refused"""
+        style = cbm.get_style("#", 30)
+        block = cbm.convert_to_comment(texts[5], 0, 1, 1, style)
+        buffer = cbm.render_block(texts[5], 0, 1, 1, style)
+        lines = block.split(u"\n")
+        self.assertEqual(buffer.text(2, 5), u"\n".join(lines[2:5]))
+        self.assertEqual(buffer.text(5, 2), u"")
+        self.assertEqual(buffer.text(3, 1000), u"\n".join(lines[3:]))
+        self.assertRaises(IndexError, buffer.line, len(lines))
+        self.assertRaises(IndexError, buffer.line, -1)
+
+    def test_memory_map(self):
+        """A block in a memory map, as a large one is where it can be, is the same"""
+        style = cbm.get_style("//", 40)
+        block = cbm.convert_to_comment(texts[4], 1, 1, 2, style)
+        saved = cbm._mapThreshold
+        cbm._mapThreshold = 0
+        try:
+            buffer = cbm.render_block(texts[4], 1, 1, 2, style)
+        finally:
+            cbm._mapThreshold = saved
+        self.assertEqual(buffer.text(), block)
+        buffer.close()
+
+    def test_not_ascii(self):
+        """Text that is not printable ASCII is refused"""
+        style = cbm.get_style("#", 30)
+        for text in (u"caf\xe9", u"a\x0cb", u"wide \u6f22"):
+            self.assertRaises(ValueError, cbm.render_block, text, 0, 0, 0, style)
+
+if __name__ == "__main__":
+    unittest.main()
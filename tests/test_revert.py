@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""Tests that reverting a comment block in one pass gives the text the regex passes gave
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, re, itertools, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import CommentBlockMaker as cbm
+
+texts = (u"One line",
+        u"First paragraph, long enough to be wrapped over a few lines of the block\n\n"
+        u"Second paragraph\n",
+        u"-----A title\ntext under it that is long enough to be wrapped over a few lines",
+        u"\tTabbed line of text that goes on for long enough to wrap, with    runs of spaces",
+        u"short\nlines\nof\ntext\n\n\nafter blank lines",
+        u"averyveryverylongwordthatislongerthanthewholeblock and more words after it")
+# Styles of one character, the only ones there were when reverting was done by regex
+regexStyles = u"#$;:/*\\"
+
+
+# --------------------- TESTS ---------------------
+
+def regex_revert(commentBlock):
+    """Return the plain text of a block as revert_to_plain() did before iter_plain_lines()"""
+    plainText = re.sub(r"(?m)^[#$;:/*\\][ ]+[#$;:/*\\]$\n", r"\n", commentBlock)
+    plainText = re.sub(r"(?m)^[#$;:/*\\]+$\n?", "", plainText)
+    plainText = re.sub(r"(?m)^[#$;:/*\\][ ]{4,}([^ ].+?)[ ]+[#$;:/*\\]$\n", r"\1\n", plainText)
+    testNum = int((len(commentBlock.splitlines()[0]) - 4)/3)
+    plainText = re.sub(r"(?m)^[#$;:/*\\][ ]+([^ ].+?)[ ]{" + str(testNum) + r",}[#$;:/*\\]$\n",
+                        r"\1\n", plainText)
+    plainText = re.sub(r"([^ \n]+)[ ]+[#$;:/*\\]\n[#$;:/*\\]?[ ]*([^ \n]+)", r"\1 \2",
+                        plainText)
+    plainText = re.sub(r"(?m)^[#$;:/*\\][ ]+", "", plainText)
+    return re.sub(r"(?m)[ ]+[#$;:/*\\]$", "", plainText)
+
+class RevertTest(unittest.TestCase):
+    """Reverting with revert_to_plain() and iter_plain_lines()"""
+
+    def blocks(self, styleNames):
+        """Generate a style and a block of it for every text, width and option"""
+        for styleName in styleNames:
+            for width in (30, 40, 72):
+                style = cbm.get_style(styleName, width)
+                for text, alignCenter, centerTitles, padCount in itertools.product(texts,
+                                                                (0, 1), (0, 1), (0, 1, 2)):
+                    yield style, cbm.convert_to_comment(text, alignCenter, centerTitles,
+                                                        padCount, style)
+
+    def test_as_regex(self):
+        """Blocks revert to the text the regex passes gave"""
+        for style, block in self.blocks(regexStyles):
+            self.assertEqual(cbm.revert_to_plain(block, style), regex_revert(block),
+                            (style.name, block))
+
+    def test_streamed(self):
+        """Block lines from a stream revert as the whole block does, in every style"""
+        for style, block in self.blocks(cbm.commentStyles):
+            lines = (x for x in block.split(u"\n"))
+            self.assertEqual(u"\n".join(cbm.iter_plain_lines(lines, style)),
+                            cbm.revert_to_plain(block, style), (style.name, block))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+"""Tests of the server that cbm_client.py sends requests to
+
+Run with python -m unittest discover tests, or with pytest.
+"""
+
+# --------------------- IMPORTS & SETUP ---------------------
+
+import sys, os, shutil, stat, socket, subprocess, tempfile, time, unittest
+
+scriptDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, scriptDir)
+import CommentBlockMaker as cbm
+import cbm_client
+
+defaults = {"align": "left", "centerTitles": False, "pad": 0, "style": "#", "width": 72,
+            "exact": False, "optimalFit": False}
+
+
+# --------------------- TESTS ---------------------
+
+class RequestTest(unittest.TestCase):
+    """Requests answered by handle_request()"""
+
+    def test_convert(self):
+        """A block is made with the options of the request"""
+        response = cbm.handle_request({"action": "convert", "text": "Hello",
+                                        "options": {"width": 20, "pad": 1}}, dict(defaults))
+        self.assertTrue(response["ok"])
+        self.assertEqual(response["text"], cbm.convert_to_comment("Hello", 0, 0, 1,
+                                                                    cbm.get_style("#", 20)))
+
+    def test_oversized(self):
+        """Padding and widths too large to make a block of quickly are refused"""
+        for options in ({"pad": 1e9}, {"pad": 401}, {"pad": float("inf")}, {"pad": -1},
+                        {"width": 10**9}, {"width": 401}):
+            response = cbm.handle_request({"action": "convert", "text": "Hello",
+                                            "options": options}, dict(defaults))
+            self.assertFalse(response["ok"], options)
+            self.assertIn("error", response)
+        response = cbm.handle_request({"action": "options", "options": {"pad": 1e9}},
+                                        dict(defaults))
+        self.assertFalse(response["ok"])
+
+    def test_socket_directory(self):
+        """Without $XDG_RUNTIME_DIR, the socket is in a directory closed to other users"""
+        oldRuntimeDir = os.environ.pop("XDG_RUNTIME_DIR", None)
+        try:
+            for socketPath in (cbm.default_socket_path(), cbm_client.socket_path()):
+                info = os.stat(os.path.dirname(socketPath))
+                self.assertEqual(info.st_uid, os.getuid())
+                self.assertEqual(stat.S_IMODE(info.st_mode) & 0o077, 0)
+        finally:
+            if oldRuntimeDir is not None:
+                os.environ["XDG_RUNTIME_DIR"] = oldRuntimeDir
+
+
+class ServerTest(unittest.TestCase):
+    """A server running in a process of its own"""
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.socketPath = os.path.join(self.tempDir, "cbm.sock")
+        with open(os.devnull, "r+b") as devNull:
+            self.process = subprocess.Popen([sys.executable, os.path.join(scriptDir,
+                                            "CommentBlockMaker.py"), "--serve", "--socket",
+                                            self.socketPath], stdin=devNull, stdout=devNull,
+                                            stderr=devNull)
+        deadline = time.time() + cbm_client.startTimeout
+        while True:
+            try:
+                cbm_client.send_request(self.socketPath, {"action": "ping"})
+                break
+            except socket.error:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def tearDown(self):
+        try:
+            cbm_client.send_request(self.socketPath, {"action": "shutdown"})
+            self.process.wait()
+        finally:
+            if self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+            shutil.rmtree(self.tempDir)
+
+    def test_oversized_request(self):
+        """An oversized request is refused at once, and the server goes on answering"""
+        start = time.time()
+        response = cbm_client.send_request(self.socketPath, {"action": "convert",
+                                            "text": "Hello", "options": {"pad": 1e9}})
+        self.assertFalse(response["ok"])
+        self.assertIn("pad", response["error"])
+        self.assertLess(time.time() - start, 5)
+        self.assertTrue(cbm_client.send_request(self.socketPath, {"action": "ping"})["ok"])
+        response = cbm_client.send_request(self.socketPath, {"action": "convert",
+                                            "text": "Hello", "options": {"width": 20}})
+        self.assertEqual(response["text"], cbm.convert_to_comment("Hello", 0, 0, 0,
+                                                                    cbm.get_style("#", 20)))
+
+if __name__ == "__main__":
+    unittest.main()